@@ -0,0 +1,635 @@
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import zipfile
+
+import discord
+from discord import app_commands
+
+import main
+
+GUILD_CONFIG = next(iter(main.guild_configs.values()))
+ADMIN_ROLE_ID = next(iter(GUILD_CONFIG.admin_roles))
+
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+
+class FakeMember(discord.Member):
+    def __init__(self, guild, user_id: int, name: str, admin: bool = False):
+        self.fake_guild = guild
+        self.fake_id = user_id
+        self.fake_name = name
+        self.fake_roles = [FakeRole(ADMIN_ROLE_ID)] if admin else []
+
+    @property
+    def id(self):
+        return self.fake_id
+
+    @property
+    def guild(self):
+        return self.fake_guild
+
+    @property
+    def display_name(self):
+        return self.fake_name
+
+    @property
+    def mention(self):
+        return f"<@{self.fake_id}>"
+
+    @property
+    def roles(self):
+        return self.fake_roles
+
+    @property
+    def bot(self):
+        return False
+
+class FakeChannel:
+    def __init__(self, channel_id: int, api_latency: float):
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+        self.api_latency = api_latency
+        self.messages = {}
+        self.sent = 0
+
+    async def send(self, content=None, embed=None, view=None):
+        await asyncio.sleep(self.api_latency)
+        self.sent += 1
+        message = FakeMessage(self, embed)
+        self.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id: int):
+        await asyncio.sleep(self.api_latency)
+        return self.messages[message_id]
+
+class FakeMessage:
+    edits = 0
+
+    def __init__(self, channel: FakeChannel, embed: discord.Embed = None):
+        self.id = discord.utils.time_snowflake(discord.utils.utcnow()) + random.randrange(1 << 22)
+        self.channel = channel
+        self.embeds = [embed] if embed is not None else []
+
+    async def edit(self, embed=None, view=None):
+        await asyncio.sleep(self.channel.api_latency)
+        FakeMessage.edits += 1
+        if embed is not None:
+            self.embeds = [embed]
+        return self
+
+class FakeGuild:
+    def __init__(self, guild_id: int, channels):
+        self.id = guild_id
+        self.channels = {channel.id: channel for channel in channels}
+        self.filesize_limit = 25 * 1024 * 1024
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    async def send_message(self, content=None, embed=None, view=None, ephemeral=False):
+        self.done = True
+        self.interaction.sent_message = await self.interaction.channel.send(content, embed=embed, view=view)
+
+    async def defer(self, ephemeral=False, thinking=False):
+        self.done = True
+
+    async def edit_message(self, embed=None, view=None):
+        self.done = True
+        await self.interaction.message.edit(embed=embed, view=view)
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, embed=None, file=None, ephemeral=False):
+        if file is not None:
+            file.close()
+        return await self.interaction.channel.send(content, embed=embed)
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember, guild: FakeGuild, channel: FakeChannel, message: FakeMessage = None):
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = channel
+        self.channel_id = channel.id
+        self.message = message
+        self.sent_message = None
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def original_response(self):
+        return self.sent_message
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags = []
+        self.task = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement):
+        self.count += 1
+
+def seed_history(conn, guild_id: int, week_keys, members):
+    conn.executemany("""
+        INSERT OR IGNORE INTO farm_rollups (guild_id, week_key, membro_id, membro, pedra, semente, total)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (guild_id, week_key, member.id, member.display_name, pedra, semente, pedra + semente)
+        for week_key in week_keys
+        for member in members
+        for pedra, semente in [(float(random.randint(0, 500)), float(random.randint(0, 500)))]
+    ))
+
+def percentile(values, fraction: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def measure(name: str, calls, counter: QueryCounter, concurrent: bool = True):
+    monitor = LoopLagMonitor()
+    queries_before = counter.count
+    latencies = []
+
+    async def timed(call):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+
+    monitor.start()
+    start = time.perf_counter()
+    if concurrent:
+        await asyncio.gather(*(timed(call) for call in calls))
+    else:
+        for call in calls:
+            await timed(call)
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+
+    lags = monitor.lags or [0.0]
+    print(
+        f"{name:<24} n={len(latencies):<6} total={elapsed * 1000:9.1f}ms "
+        f"p50={percentile(latencies, 0.50) * 1000:8.2f}ms p99={percentile(latencies, 0.99) * 1000:8.2f}ms "
+        f"lag_max={max(lags) * 1000:7.2f}ms lag_total={sum(lags) * 1000:8.1f}ms "
+        f"queries={counter.count - queries_before}"
+    )
+
+async def browse_roster(message: FakeMessage, user: FakeMember, guild: FakeGuild, channel: FakeChannel):
+    view = main.PVPRosterView(message.id)
+    await view.render()
+    roster_message = FakeMessage(channel)
+    while not view.proxima.disabled:
+        await view.proxima.callback(FakeInteraction(user, guild, channel, roster_message))
+
+async def run_benchmark(args):
+    workdir = tempfile.mkdtemp(prefix="faction-bench-")
+    main.ARCHIVE_DB_FILE = os.path.join(workdir, "archive.db")
+    journal = None
+    if args.journal:
+        journal = main.CommandJournal(
+            os.path.join(workdir, "faction.journal"),
+            os.path.join(workdir, "faction.snapshot.db"),
+            main.JOURNAL_BATCH_SIZE,
+            main.JOURNAL_FLUSH_INTERVAL
+        )
+    main.db = main.Database(os.path.join(workdir, "faction.db"), journal)
+    main.storage = main.MemoryStorage() if args.storage == "memory" else main.SQLiteStorage(main.db)
+    main.pvp_renderer.interval = args.render_interval
+
+    counter = QueryCounter()
+    await main.db.run(main.init_db)
+    if journal is not None:
+        await main.db.run(main.snapshot_database, journal)
+    await main.db.run(lambda conn: conn.set_trace_callback(counter))
+
+    channel = FakeChannel(1, args.api_latency)
+    ranking_channel = FakeChannel(GUILD_CONFIG.ranking_channel_id, args.api_latency)
+    guild = FakeGuild(GUILD_CONFIG.guild_id, [channel, ranking_channel])
+    admin = FakeMember(guild, 1, "Admin", admin=True)
+    members = [FakeMember(guild, 100 + i, f"Membro {i}") for i in range(args.members)]
+    main.member_indexes[guild.id].rebuild(members)
+    farm_types = [app_commands.Choice(name=farm_tipo, value=farm_tipo) for farm_tipo in main.FARM_TYPES]
+
+    print(f"Banco de teste em {workdir}")
+
+    rows = [
+        (member.id, member.display_name, random.choice(main.FARM_TYPES), float(random.randint(1, 500)))
+        for member in random.choices(members, k=args.farm_rows)
+    ]
+    await measure(
+        "seed add_farms_bulk",
+        [lambda: main.storage.add_farms_bulk(guild.id, rows, admin.id, admin.display_name)],
+        counter
+    )
+
+    await measure(
+        "/farm",
+        [
+            lambda: main.farm.callback(
+                FakeInteraction(admin, guild, channel),
+                str(random.choice(members).id),
+                float(random.randint(1, 500)),
+                random.choice(farm_types)
+            )
+            for _ in range(args.farms)
+        ],
+        counter
+    )
+
+    await measure(
+        "/farm autocomplete",
+        [
+            (lambda prefix=prefix: main.farm_membro_autocomplete(FakeInteraction(admin, guild, channel), prefix))
+            for prefix in ("", "m", "membro 1", "membro 42", "x") * max(1, args.reads // 5)
+        ],
+        counter
+    )
+
+    await measure(
+        "/previewtop",
+        [lambda: main.previewtop.callback(FakeInteraction(admin, guild, channel)) for _ in range(args.reads)],
+        counter
+    )
+
+    history_weeks = main.get_week_range(main.get_week_key(), args.history_weeks)
+    await main.db.run(seed_history, guild.id, history_weeks[:-1], members)
+    await measure(
+        f"/historico {args.history_weeks} semanas",
+        [
+            lambda: main.historico.callback(FakeInteraction(admin, guild, channel), args.history_weeks)
+            for _ in range(args.reads)
+        ],
+        counter
+    )
+
+    await measure(
+        "/historico membro",
+        [
+            lambda: main.historico.callback(
+                FakeInteraction(admin, guild, channel),
+                args.history_weeks,
+                membro=str(random.choice(members).id)
+            )
+            for _ in range(args.reads)
+        ],
+        counter
+    )
+
+    await measure(
+        "/ritmo 24 horas",
+        [lambda: main.ritmo.callback(FakeInteraction(admin, guild, channel), 24) for _ in range(args.reads)],
+        counter
+    )
+
+    await measure(
+        "/exportar",
+        [lambda: main.exportar.callback(FakeInteraction(admin, guild, channel), 1)],
+        counter
+    )
+
+    await measure(
+        "/fechamento",
+        [lambda: main.fechamento.callback(FakeInteraction(admin, guild, channel))],
+        counter
+    )
+
+    event_interaction = FakeInteraction(admin, guild, channel)
+    await measure(
+        "/pvpevent",
+        [lambda: main.pvpevent.callback(event_interaction, "Benchmark", "Evento de carga")],
+        counter
+    )
+    message = event_interaction.sent_message
+
+    view = main.PVPEventView()
+    buttons = [view.participar, view.recusar, view.remover]
+    edits_before = FakeMessage.edits
+    await measure(
+        "PVPEventView clicks",
+        [
+            (lambda user_id=user_id: random.choice(buttons).callback(
+                FakeInteraction(FakeMember(guild, 1000 + user_id, f"Jogador {user_id}"), guild, channel, message)
+            ))
+            for user_id in range(args.clicks)
+        ],
+        counter
+    )
+
+    while main.pvp_renderer.tasks:
+        await asyncio.sleep(0.01)
+
+    print(
+        f"Edições do evento: {FakeMessage.edits - edits_before} para {args.clicks} cliques "
+        f"(economizadas no total: {main.pvp_renderer.saved})"
+    )
+
+    await measure(
+        "PVP lista paginada",
+        [lambda: browse_roster(message, admin, guild, channel) for _ in range(args.reads)],
+        counter
+    )
+
+    if args.storage == "sqlite":
+        # Evento encerrado e podado: as confirmações vão para o arquivo, o evento fica no banco principal
+        await main.storage.close_pvp_event(message.id)
+        moved = await main.db.run(main.prune_closed_pvp_events, main.get_timestamp() + 1)
+        counts = main.export_csv_zip(
+            main.db.path, main.ARCHIVE_DB_FILE, guild.id, [main.get_week_key()], os.path.join(workdir, "export.zip")
+        )
+        print(f"Exportação após podar {moved} confirmações: {counts['pvp_confirmations']} no CSV")
+        if counts["pvp_confirmations"] != moved:
+            raise SystemExit("❌ Confirmações podadas ficaram fora da exportação.")
+
+        await measure(
+            "/exportar pós-poda",
+            [lambda: main.exportar.callback(FakeInteraction(admin, guild, channel), 1)],
+            counter
+        )
+
+    main.db.close()
+
+    if journal is not None:
+        print(f"Diário: {journal.seq} entradas gravadas em {journal.flushes} fsyncs")
+        main.rebuild_from_journal(journal.snapshot_path, journal.path, os.path.join(workdir, "faction.rebuilt.db"))
+
+def event_snapshot(event):
+    if event is None:
+        return None
+    return (
+        event.guild_id,
+        event.message_id,
+        event.channel_id,
+        event.title,
+        event.description,
+        event.created_by_name,
+        event.week_key,
+        event.starts_at,
+        event.closed_at is not None,
+        dict(event.confirmados),
+        dict(event.recusados),
+    )
+
+def random_storage_operation(guild_ids, message_ids):
+    guild_id = random.choice(guild_ids)
+    message_id = random.choice(message_ids)
+    user_id = random.randint(1, 40)
+    week_key = random.choice(recent_week_keys(2))
+    roll = random.random()
+
+    if roll < 0.25:
+        return "add_farm", (guild_id, user_id, f"Membro {user_id}", random.choice(main.FARM_TYPES), float(random.randint(1, 500)), 1, "Admin")
+    if roll < 0.30:
+        rows = [
+            (membro_id, f"Membro {membro_id}", random.choice(main.FARM_TYPES), float(random.randint(1, 500)))
+            for membro_id in random.choices(range(1, 41), k=random.randint(1, 30))
+        ]
+        return "add_farms_bulk", (guild_id, rows, 1, "Admin")
+    if roll < 0.36:
+        starts_at = random.choice([None, 1700000000, main.get_timestamp()])
+        return "save_pvp_event", (guild_id, message_id, 5, f"⚔️ Evento {message_id}", "Descrição", 1, "Admin", starts_at)
+    if roll < 0.40:
+        return "close_pvp_event", (message_id, random.choice([None, guild_id]))
+    if roll < 0.70:
+        status = random.choice(["confirmado", "recusado"])
+        return "upsert_confirmation", (guild_id, message_id, user_id, f"Jogador {user_id}.{random.randint(0, 2)}", status)
+    if roll < 0.80:
+        return "delete_confirmation", (message_id, user_id)
+    if roll < 0.87:
+        return "remove_member_from_event", (guild_id, message_id, user_id)
+    if roll < 0.90:
+        return "close_week", (guild_id, week_key, 1, "Admin")
+    if roll < 0.92:
+        return "mark_week_published", (guild_id, week_key)
+    if roll < 0.94:
+        return "prune_closed_pvp_events", (main.get_timestamp() - random.randint(0, 3600),)
+    if roll < 0.95:
+        return "archive_old_weeks", (random.randint(0, 1),)
+    if roll < 0.97:
+        return "rebuild_rollups", (guild_id,)
+    return "set_state", (f"last_closed_week:{guild_id}", week_key)
+
+def recent_week_keys(weeks: int):
+    return main.get_week_range(main.get_week_key(), weeks)
+
+def ranking_totals(rows):
+    return [row[-1] for row in rows]
+
+def normalize_storage_result(result):
+    if isinstance(result, main.PVPEventState):
+        return event_snapshot(result)
+    return result
+
+def read_export(path: str):
+    with zipfile.ZipFile(path) as archive:
+        return {name: sorted(archive.read(name).decode("utf-8-sig").splitlines()) for name in archive.namelist()}
+
+async def compare_storage_reads(backends, guild_ids, message_ids, workdir: str):
+    week_key = main.get_week_key()
+    week_keys = recent_week_keys(3)
+    now = main.get_timestamp()
+    reads = [
+        ("get_due_pvp_events", sorted, lambda backend: backend.get_due_pvp_events(now)),
+    ]
+    for guild_id in guild_ids:
+        # Empates podem sair em ordem diferente: o ranking completo é comparado como conjunto
+        # e o top 10 só pela sequência de totais.
+        reads += [
+            (f"get_week_ranking {guild_id}", sorted, lambda backend, guild_id=guild_id: backend.get_week_ranking(guild_id, week_key, 100000)),
+            (f"get_week_ranking top 10 {guild_id}", ranking_totals, lambda backend, guild_id=guild_id: backend.get_week_ranking(guild_id, week_key)),
+            (f"get_farm_breakdown {guild_id}", sorted, lambda backend, guild_id=guild_id: backend.get_farm_breakdown(guild_id, 100000)),
+            (f"get_top_pvp {guild_id}", sorted, lambda backend, guild_id=guild_id: backend.get_top_pvp(guild_id, 100000)),
+            (f"get_top_pvp top 10 {guild_id}", ranking_totals, lambda backend, guild_id=guild_id: backend.get_top_pvp(guild_id)),
+            (f"get_farm_history {guild_id}", sorted, lambda backend, guild_id=guild_id: backend.get_farm_history(guild_id, week_keys)),
+            (f"get_member_history {guild_id}", list, lambda backend, guild_id=guild_id: backend.get_member_history(guild_id, random.randint(1, 40), week_keys)),
+            (f"get_farm_rate {guild_id}", sorted, lambda backend, guild_id=guild_id: backend.get_farm_rate(guild_id, now - 6 * 3600, 3600, 6)),
+            (f"get_state {guild_id}", None, lambda backend, guild_id=guild_id: backend.get_state(f"last_closed_week:{guild_id}")),
+            (f"export_csv_zip {guild_id}", read_export, lambda backend, guild_id=guild_id: export_to(backend, guild_id, week_keys, workdir)),
+        ]
+        for key in week_keys:
+            reads.append((f"is_week_published {guild_id} {key}", None, lambda backend, guild_id=guild_id, key=key: backend.is_week_published(guild_id, key)))
+    for message_id in message_ids:
+        reads.append((f"load_pvp_event {message_id}", event_snapshot, lambda backend, message_id=message_id: backend.load_pvp_event(message_id)))
+
+    differences = []
+    for name, normalize, read in reads:
+        # A mesma semente para os dois backends: leituras com sorteio consultam o mesmo membro.
+        state = random.getstate()
+        results = []
+        for backend in backends:
+            random.setstate(state)
+            result = await read(backend)
+            results.append(normalize(result) if normalize is not None else result)
+        if results[0] != results[1]:
+            differences.append((name, results))
+    return differences
+
+async def export_to(backend, guild_id: int, week_keys, workdir: str):
+    path = os.path.join(workdir, f"export-{type(backend).__name__}.zip")
+    await backend.export_csv_zip(guild_id, week_keys, path)
+    return path
+
+async def set_clock(timestamp: int):
+    # Os dois backends precisam ver o mesmo horário: o SQLite lê o relógio na thread do banco.
+    main.frozen_clock.timestamp = timestamp
+    await main.db.run(lambda conn: setattr(main.frozen_clock, "timestamp", timestamp))
+
+async def check_storage_conformance(operations: int, seed: int):
+    random.seed(seed)
+    workdir = tempfile.mkdtemp(prefix="faction-conformance-")
+    main.ARCHIVE_DB_FILE = os.path.join(workdir, "archive.db")
+    main.db = main.Database(os.path.join(workdir, "faction.db"))
+    await main.db.run(main.init_db)
+
+    backends = [main.SQLiteStorage(main.db), main.MemoryStorage()]
+    guild_ids = [GUILD_CONFIG.guild_id, GUILD_CONFIG.guild_id + 1]
+    message_ids = list(range(1000, 1020))
+    differences = []
+    clock = int(time.time())
+    start = time.perf_counter()
+    for number in range(1, operations + 1):
+        # O relógio avança alguns minutos por operação, então as semanas também viram durante o teste.
+        clock += random.randint(0, 900)
+        await set_clock(clock)
+
+        name, args = random_storage_operation(guild_ids, message_ids)
+        results = [normalize_storage_result(await getattr(backend, name)(*args)) for backend in backends]
+        if results[0] != results[1]:
+            differences.append((f"#{number} {name}{args}", results))
+
+        if number % 100 == 0 or number == operations:
+            differences.extend(await compare_storage_reads(backends, guild_ids, message_ids, workdir))
+
+    await set_clock(None)
+    main.db.close()
+    print(f"Conformidade SQLite x memória: {operations} operações em {time.perf_counter() - start:.2f}s, {len(differences)} divergências")
+    for name, results in differences[:10]:
+        print(f"  {name}: sqlite={results[0]!r} memória={results[1]!r}")
+    return not differences
+
+PLAN_GUARDED_TABLES = ("farms", "pvp_confirmations")
+PLAN_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+PLAN_KEYWORDS = {"WHERE", "SET", "ON", "JOIN", "LEFT", "INNER", "CROSS", "GROUP", "ORDER", "VALUES", "USING", "UNION", "LIMIT"}
+
+def find_table_scans(sql: str, plan):
+    # O EXPLAIN mostra o apelido quando a consulta usa um (ex.: "SCAN pc"), então mapeia apelido -> tabela.
+    names = set(PLAN_GUARDED_TABLES)
+    for table in PLAN_GUARDED_TABLES:
+        for alias in re.findall(rf"\b{table}\s+(?:AS\s+)?(\w+)", sql, re.IGNORECASE):
+            if alias.upper() not in PLAN_KEYWORDS:
+                names.add(alias)
+    return [row[3] for row in plan if re.match(r"SCAN (\w+)", row[3]) and row[3].split()[1] in names]
+
+async def check_query_plans():
+    workdir = tempfile.mkdtemp(prefix="faction-plans-")
+    main.db = main.Database(os.path.join(workdir, "faction.db"))
+    await main.db.run(main.init_db)
+
+    guild_id = GUILD_CONFIG.guild_id
+    week_key = main.get_week_key()
+    week_keys = main.get_week_range(week_key, 4)
+    message_id = 1000
+    statements = []
+    await main.db.run(lambda conn: conn.set_trace_callback(statements.append))
+
+    # Caminhos quentes de farm, ranking, rollup e confirmação; arquivamento e poda varrem tudo de propósito.
+    await main.db.run(main.add_farm, guild_id, 100, "Membro", "pedra", 10.0, 1, "Admin")
+    await main.db.run(main.add_farms_bulk, guild_id, [(101, "Outro", "semente", 5.0)], 1, "Admin")
+    await main.db.run(main.get_farm_breakdown, guild_id)
+    await main.db.run(main.get_week_ranking, guild_id, week_key)
+    await main.db.run(main.get_legacy_farm_members, guild_id)
+    await main.db.run(main.get_farm_rate, guild_id, main.get_timestamp() - 3600, 300, 12)
+    await main.db.run(main.get_farm_history, guild_id, week_keys)
+    await main.db.run(main.get_member_history, guild_id, 100, week_keys)
+    await main.db.run(main.save_pvp_event, guild_id, message_id, 1, "Evento", "", 1, "Admin")
+    await main.db.run(main.upsert_confirmation, guild_id, message_id, 100, "Membro", "confirmado")
+    await main.db.run(main.upsert_confirmation, guild_id, message_id, 101, "Outro", "confirmado")
+    await main.db.run(main.get_confirmation, message_id, 100)
+    await main.db.run(main.delete_confirmation, message_id, 100)
+    await main.db.run(main.remove_member_from_event, guild_id, message_id, 101)
+    await main.db.run(main.load_pvp_event, message_id)
+    await main.db.run(main.warm_pvp_cache)
+    await main.db.run(main.get_top_pvp, guild_id)
+    await main.db.run(main.get_due_pvp_events, main.get_timestamp())
+    await main.db.run(main.close_pvp_event, message_id, guild_id)
+    await main.db.run(main.close_week, guild_id, week_key, 1, "Admin")
+    await main.db.run(main.rebuild_rollups, guild_id)
+    await main.db.run(lambda conn: conn.set_trace_callback(None))
+
+    queries = [(statement, ()) for statement in dict.fromkeys(statements)]
+    for table in main.EXPORT_TABLES:
+        queries.append(await main.db.run(main.build_export_query, ["main"], table, guild_id, week_keys))
+
+    failures = 0
+    for sql, params in queries:
+        sql = sql.strip()
+        if not sql or sql.split(None, 1)[0].upper() not in PLAN_STATEMENTS:
+            continue
+        plan = await main.db.run(lambda conn: conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall())
+        scans = find_table_scans(sql, plan)
+        if scans:
+            failures += 1
+            print(f"❌ {' '.join(sql.split())[:160]}")
+            for row in plan:
+                print(f"     {row[3]}")
+
+    main.db.close()
+    print(f"Planos de consulta: {len(queries)} consultas verificadas, {failures} com SCAN em {', '.join(PLAN_GUARDED_TABLES)}")
+    return not failures
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark offline do bot da facção")
+    parser.add_argument("--farm-rows", type=int, default=100000)
+    parser.add_argument("--farms", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=100)
+    parser.add_argument("--clicks", type=int, default=200)
+    parser.add_argument("--members", type=int, default=300)
+    parser.add_argument("--history-weeks", type=int, default=52)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--render-interval", type=float, default=main.PVP_RENDER_INTERVAL)
+    parser.add_argument("--journal", action="store_true", help="Grava o diário de comandos e mede o replay no final")
+    parser.add_argument("--storage", choices=["sqlite", "memory"], default="sqlite")
+    parser.add_argument("--conformance", type=int, default=0, help="Compara N operações aleatórias entre os backends SQLite e memória e sai")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--check-plans", action="store_true", help="Falha se alguma consulta quente fizer SCAN em farms ou pvp_confirmations e sai")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.check_plans:
+        sys.exit(0 if asyncio.run(check_query_plans()) else 1)
+    if args.conformance:
+        sys.exit(0 if asyncio.run(check_storage_conformance(args.conformance, args.seed)) else 1)
+    asyncio.run(run_benchmark(args))
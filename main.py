@@ -1,15 +1,76 @@
 import os
+import io
+import re
+import csv
+import json
+import bisect
+import time
+import hashlib
+import contextlib
+import asyncio
+import functools
+import heapq
+import weakref
 import sqlite3
+import zipfile
+import tempfile
+import threading
+import shutil
+import sys
+import aiohttp
 import discord
 from discord.ext import commands
 from discord import app_commands
-from datetime import datetime
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 
 TOKEN = os.getenv("DISCORD_TOKEN")
 GUILD_ID = 1486268008266596443
 WELCOME_LOG_CHANNEL_ID = 1486268009550188556
 RANKING_CHANNEL_ID = 1486268011823366218
+GUILDS_FILE = "guilds.json"
 DB_FILE = "faction.db"
+ARCHIVE_DB_FILE = "faction_archive.db"
+ARCHIVE_RETENTION_WEEKS = 8
+JOURNAL_ENABLED = os.getenv("FACTION_JOURNAL", "1") == "1"
+JOURNAL_FILE = "faction.journal"
+JOURNAL_SNAPSHOT_FILE = "faction.snapshot.db"
+JOURNAL_BATCH_SIZE = 256
+JOURNAL_FLUSH_INTERVAL = 0.5
+JOURNAL_SNAPSHOT_INTERVAL = timedelta(hours=6)
+JOURNAL_SNAPSHOT_ENTRIES = 50000
+JOURNAL_CHECK_INTERVAL = 60
+JOURNAL_REPLAY_BATCH = 5000
+PVP_RENDER_INTERVAL = 1.5
+PVP_CACHE_SIZE = 200
+PVP_CACHE_MAX_AGE = timedelta(days=14)
+PVP_ROSTER_PAGE_SIZE = 25
+PVP_EVENT_DURATION = timedelta(hours=3)
+PVP_EVENT_MAX_OPEN = timedelta(days=7)
+PVP_PRUNE_AFTER = timedelta(days=7)
+PVP_LIFECYCLE_INTERVAL = 300
+EVENT_TIMEZONE = timezone(timedelta(hours=-3))
+FARM_BULK_MAX_LINES = 20000
+FARM_BULK_MAX_BYTES = 2 * 1024 * 1024
+FARM_TYPES = ["Pedra", "Semente"]
+HISTORY_PAGE_SIZE = 10
+AUTO_CLOSE_ENABLED = os.getenv("FACTION_AUTO_CLOSE", "1") == "1"
+AUTO_CLOSE_DELAY = timedelta(hours=3)
+AUTO_CLOSE_PRECOMPUTE = timedelta(minutes=10)
+AUTO_CLOSE_MAX_CATCH_UP = 8
+AUTO_CLOSE_RETRY_INTERVAL = timedelta(minutes=10)
+HISTORY_VIEW_TIMEOUT = 300
+METRICS_ENABLED = os.getenv("FACTION_METRICS", "1") == "1"
+METRICS_FILE = "faction_metrics.prom"
+METRICS_WRITE_INTERVAL = 30
+LOOP_LAG_INTERVAL = 0.5
+MEMBER_LOG_INTERVAL = 5
+MEMBER_LOG_MAX_PENDING = 5000
+WELCOME_DM_QUEUE_SIZE = 500
+WELCOME_DM_WORKERS = 2
+WELCOME_DM_RETRIES = 3
 
 ADMIN_ROLES = [
     1486268008409206867,
@@ -18,25 +79,664 @@ ADMIN_ROLES = [
     1486268008266596448
 ]
 
+class Histogram:
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def observe(self, value: float, rows: int = 0):
+        index = 0
+        while index < len(self.BUCKETS) and value > self.BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.rows += rows
+
+    def quantile(self, q: float) -> float:
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+class Metrics:
+    BUCKET_LABELS = [str(bound) for bound in Histogram.BUCKETS] + ["+Inf"]
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self.loop_lag = 0.0
+
+    def observe(self, kind: str, name: str, seconds: float, rows: int = 0):
+        histogram = self.histograms.get((kind, name))
+        if histogram is None:
+            histogram = self.histograms[(kind, name)] = Histogram()
+        histogram.observe(seconds, rows)
+
+    def increment(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def by_kind(self, kind: str):
+        return {name: histogram for (hist_kind, name), histogram in self.histograms.items() if hist_kind == kind}
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        async def on_request_start(session, context, params):
+            context.start = time.perf_counter()
+
+        async def on_request_end(session, context, params):
+            route = re.sub(r"/[A-Za-z0-9_\-\.]{40,}", "/:token", re.sub(r"/\d{15,}", "/:id", params.url.path))
+            self.observe("discord_api", f"{params.method} {route}", time.perf_counter() - context.start)
+            if params.response.status == 429:
+                self.increment("discord_rate_limits")
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        return trace
+
+    def gauges(self):
+        return {
+            "event_loop_lag_seconds": self.loop_lag,
+            "pvp_render_requests": pvp_renderer.requested,
+            "pvp_render_edits": pvp_renderer.edits,
+            "pvp_render_edits_saved": pvp_renderer.saved,
+            "pvp_render_failures": pvp_renderer.failures,
+            "pvp_render_missing": pvp_renderer.missing,
+            "pvp_cache_hits": storage.cache.hits,
+            "pvp_cache_misses": storage.cache.misses,
+        }
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# TYPE faction_latency_seconds histogram",
+        ]
+        for (kind, name), histogram in sorted(self.histograms.items()):
+            labels = f'kind="{kind}",name="{name}"'
+            cumulative = 0
+            for bound, count in zip(self.BUCKET_LABELS, histogram.counts):
+                cumulative += count
+                lines.append(f'faction_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"faction_latency_seconds_sum{{{labels}}} {histogram.total}")
+            lines.append(f"faction_latency_seconds_count{{{labels}}} {histogram.count}")
+
+        lines.append("# TYPE faction_rows_total counter")
+        for (kind, name), histogram in sorted(self.histograms.items()):
+            if kind == "sql":
+                lines.append(f'faction_rows_total{{name="{name}"}} {histogram.rows}')
+
+        lines.append("# TYPE faction_events_total counter")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'faction_events_total{{name="{name}"}} {value}')
+
+        for name, value in self.gauges().items():
+            lines.append(f"# TYPE faction_{name} gauge")
+            lines.append(f"faction_{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics(METRICS_ENABLED)
+
+def instrumented(func):
+    if not metrics.enabled:
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            metrics.observe("interaction", func.__qualname__, time.perf_counter() - start)
+
+    return wrapper
+
+def write_metrics_file(path: str, content: str):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+async def metrics_loop():
+    loop = asyncio.get_running_loop()
+    next_write = loop.time() + METRICS_WRITE_INTERVAL
+
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, loop.time() - start - LOOP_LAG_INTERVAL)
+        metrics.loop_lag = lag
+        metrics.observe("event_loop", "lag", lag)
+
+        if loop.time() >= next_write:
+            next_write = loop.time() + METRICS_WRITE_INTERVAL
+            try:
+                await asyncio.to_thread(write_metrics_file, METRICS_FILE, metrics.render_prometheus())
+            except OSError as e:
+                print(f"Erro ao gravar métricas: {e}")
+
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
-guild_obj = discord.Object(id=GUILD_ID)
+class GuildConfig:
+    def __init__(self, guild_id: int, welcome_log_channel_id: int, ranking_channel_id: int, admin_roles):
+        self.guild_id = guild_id
+        self.welcome_log_channel_id = welcome_log_channel_id
+        self.ranking_channel_id = ranking_channel_id
+        self.admin_roles = set(admin_roles)
+
+def load_guild_configs(path: str):
+    if not os.path.exists(path):
+        return {GUILD_ID: GuildConfig(GUILD_ID, WELCOME_LOG_CHANNEL_ID, RANKING_CHANNEL_ID, ADMIN_ROLES)}
+
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+
+    configs = {}
+    for entry in data["guilds"]:
+        config = GuildConfig(
+            int(entry["guild_id"]),
+            int(entry["welcome_log_channel_id"]),
+            int(entry["ranking_channel_id"]),
+            [int(role_id) for role_id in entry["admin_roles"]]
+        )
+        configs[config.guild_id] = config
+    return configs
+
+guild_configs = load_guild_configs(GUILDS_FILE)
+
+bot = commands.AutoShardedBot(
+    command_prefix="!",
+    intents=intents,
+    activity=discord.Game(
+        name="/farm | /previewtop | /fechamento | /pvpevent | /removerpvp | /toppvp"
+    ),
+    http_trace=metrics.trace_config() if metrics.enabled else None
+)
+guild_objs = [discord.Object(id=guild_id) for guild_id in guild_configs]
 
 def is_admin(member: discord.Member) -> bool:
-    return any(role.id in ADMIN_ROLES for role in member.roles)
+    config = guild_configs.get(member.guild.id)
+    return config is not None and any(role.id in config.admin_roles for role in member.roles)
 
-def get_week_key():
-    now = datetime.now()
+def get_week_key(now: datetime = None):
+    now = now or datetime.fromtimestamp(get_timestamp(), timezone.utc)
     year, week, _ = now.isocalendar()
     return f"{year}-W{week}"
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+def get_week_start(week_key: str) -> datetime:
+    return datetime.strptime(f"{week_key}-1", "%G-W%V-%u").replace(tzinfo=timezone.utc)
+
+frozen_clock = threading.local()
+journal_replay = threading.local()
+
+def get_timestamp():
+    timestamp = getattr(frozen_clock, "timestamp", None)
+    return timestamp if timestamp is not None else int(time.time())
+
+def parse_week_key(value: str):
+    return get_week_key(get_week_start(value.strip().upper()))
+
+def get_week_range(last_week_key: str, weeks: int):
+    last_start = get_week_start(last_week_key)
+    return [get_week_key(last_start - timedelta(weeks=i)) for i in range(weeks - 1, -1, -1)]
+
+journal_operations = {}
+
+def journaled(func):
+    journal_operations[func.__name__] = func
+    return func
+
+def read_snapshot_seq(snapshot_path: str):
+    if not os.path.exists(snapshot_path):
+        return 0
+
+    conn = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM bot_state WHERE key = 'journal_seq'").fetchone()
+    finally:
+        conn.close()
+    return int(row[0]) if row else 0
+
+class CommandJournal:
+    def __init__(self, path: str, snapshot_path: str, batch_size: int, flush_interval: float):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.file = None
+        self.buffer = []
+        self.seq = 0
+        self.entries = 0
+        self.flushes = 0
+        self.last_snapshot = time.monotonic()
+
+    def open(self):
+        if self.file is not None:
+            return
+
+        self.seq = read_snapshot_seq(self.snapshot_path)
+        valid = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    valid += len(line)
+                    self.entries += 1
+                    self.seq = max(self.seq, entry["seq"])
+
+        self.file = open(self.path, "ab")
+        # Uma linha cortada no fim (queda durante a escrita) seria colada na próxima entrada
+        if self.file.tell() > valid:
+            print(f"Diário {self.path}: descartando {self.file.tell() - valid} bytes incompletos no final.")
+            self.file.truncate(valid)
+        threading.Thread(target=self._run, name="faction-journal", daemon=True).start()
+
+    def _run(self):
+        while not self.closed.wait(self.flush_interval):
+            self.flush()
+
+    def append(self, timestamp: int, op: str, args, kwargs):
+        with self.lock:
+            self.open()
+            self.seq += 1
+            self.entries += 1
+            self.buffer.append(json.dumps(
+                {"seq": self.seq, "ts": timestamp, "op": op, "args": args, "kwargs": kwargs},
+                ensure_ascii=False,
+                separators=(",", ":")
+            ) + "\n")
+            if len(self.buffer) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        try:
+            self.file.write("".join(self.buffer).encode("utf-8"))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.buffer.clear()
+            self.flushes += 1
+        except OSError as e:
+            print(f"Erro ao gravar o diário {self.path}: {e}")
+
+    def flush(self):
+        with self.lock:
+            self.open()
+            self._flush()
+            return self.seq
+
+    def truncate(self, seq: int):
+        with self.lock:
+            self.open()
+            self._flush()
+            if self.buffer or self.seq != seq:
+                return
+            self.file.truncate(0)
+            os.fsync(self.file.fileno())
+            self.entries = 0
+            self.last_snapshot = time.monotonic()
+
+    def close(self):
+        self.closed.set()
+        with self.lock:
+            if self.file is not None:
+                self._flush()
+                self.file.close()
+                self.file = None
+
+class Database:
+    def __init__(self, path: str, journal: CommandJournal = None):
+        self.path = path
+        self.journal = journal
+        self.conn = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="faction-db")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _call(self, func, args, kwargs):
+        if self.conn is None:
+            self.conn = self._connect()
+        try:
+            return self._call_in_transaction(func, args, kwargs)
+        except Exception:
+            # Rankings e eventos em memória podem ter recebido mudanças que o rollback desfez no banco.
+            reset_memory_state()
+            raise
+
+    def _call_in_transaction(self, func, args, kwargs):
+        if self.journal is None or journal_operations.get(func.__name__) is not func:
+            with self.conn:
+                return func(self.conn, *args, **kwargs)
+
+        # O horário fica congelado durante a operação para o replay gerar os mesmos created_at e week_key
+        frozen_clock.timestamp = get_timestamp()
+        try:
+            with self.conn:
+                result = func(self.conn, *args, **kwargs)
+            self.journal.append(frozen_clock.timestamp, func.__name__, args, kwargs)
+        finally:
+            frozen_clock.timestamp = None
+        return result
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self._call, func, args, kwargs)
+        if not metrics.enabled:
+            return await loop.run_in_executor(self.executor, call)
+
+        start = time.perf_counter()
+        result = await loop.run_in_executor(self.executor, call)
+        rows = len(result) if isinstance(result, (list, dict)) else 0
+        metrics.observe("sql", func.__name__, time.perf_counter() - start, rows)
+        return result
+
+    def _close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.journal is not None:
+            self.journal.close()
+
+    def close(self):
+        self.executor.submit(self._close).result()
+        self.executor.shutdown(wait=True)
+
+db = Database(
+    DB_FILE,
+    CommandJournal(JOURNAL_FILE, JOURNAL_SNAPSHOT_FILE, JOURNAL_BATCH_SIZE, JOURNAL_FLUSH_INTERVAL) if JOURNAL_ENABLED else None
+)
+
+class WeeklyLeaderboard:
+    def __init__(self, drop_empty: bool = False):
+        self.drop_empty = drop_empty
+        self.week_key = None
+        self.entries = {}
+        self.labels = {}
+
+    def load(self, week_key: str, rows):
+        self.week_key = week_key
+        self.entries = {row[0]: list(row[2:]) for row in rows}
+        self.labels = {row[0]: row[1] for row in rows}
+
+    def add(self, week_key: str, key, label: str, deltas):
+        if week_key != self.week_key:
+            return
+
+        self.labels[key] = label
+        values = self.entries.setdefault(key, [0] * len(deltas))
+        for i, delta in enumerate(deltas):
+            values[i] += delta
+
+        if self.drop_empty and values[-1] <= 0:
+            del self.entries[key]
+            del self.labels[key]
+
+    def invalidate(self):
+        self.week_key = None
+        self.entries = {}
+        self.labels = {}
+
+    def top(self, limit: int):
+        best = heapq.nlargest(limit, self.entries.items(), key=lambda item: item[1][-1])
+        return [(key, self.labels[key], *values) for key, values in best]
+
+farm_leaderboards = defaultdict(WeeklyLeaderboard)
+pvp_leaderboards = defaultdict(functools.partial(WeeklyLeaderboard, drop_empty=True))
+
+MENTION_PATTERN = re.compile(r"<@!?(\d+)>")
+
+class MemberIndex:
+    def __init__(self):
+        self.names = {}
+        self.keys = []
+
+    def rebuild(self, members):
+        self.names = {member.id: member.display_name for member in members if not member.bot}
+        self.keys = sorted((name.casefold(), user_id) for user_id, name in self.names.items())
+
+    def add(self, member: discord.Member):
+        self.remove(member.id)
+        if member.bot:
+            return
+
+        self.names[member.id] = member.display_name
+        bisect.insort(self.keys, (member.display_name.casefold(), member.id))
+
+    def remove(self, user_id: int):
+        name = self.names.pop(user_id, None)
+        if name is None:
+            return
+
+        key = (name.casefold(), user_id)
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def search(self, prefix: str, limit: int = 25):
+        prefix = prefix.strip().casefold()
+        results = []
+        i = bisect.bisect_left(self.keys, (prefix,))
+        while i < len(self.keys) and len(results) < limit and self.keys[i][0].startswith(prefix):
+            user_id = self.keys[i][1]
+            results.append((user_id, self.names[user_id]))
+            i += 1
+        return results
+
+    def resolve(self, value: str):
+        value = value.strip()
+        match = MENTION_PATTERN.fullmatch(value)
+        if match:
+            value = match.group(1)
+
+        if value.isdigit():
+            user_id = int(value)
+            return user_id if user_id in self.names else None
+
+        name = value.casefold()
+        i = bisect.bisect_left(self.keys, (name,))
+        matches = []
+        while i < len(self.keys) and self.keys[i][0] == name:
+            matches.append(self.keys[i][1])
+            i += 1
+        return matches[0] if len(matches) == 1 else None
+
+member_indexes = defaultdict(MemberIndex)
+
+def member_display_name(guild_id: int, user_id: int, fallback: str):
+    return member_indexes[guild_id].names.get(user_id, fallback)
+
+def member_choices(guild_id: int, current: str):
+    return [
+        app_commands.Choice(name=name, value=str(user_id))
+        for user_id, name in member_indexes[guild_id].search(current)
+    ]
+
+class RosterPages:
+    def __init__(self, page_size: int):
+        self.page_size = page_size
+        self.entries = []
+        self.rendered = {}
+
+    @property
+    def count(self):
+        return len(self.entries)
+
+    @property
+    def page_count(self):
+        return max((len(self.entries) + self.page_size - 1) // self.page_size, 1)
+
+    def load(self, roster: dict):
+        self.entries = sorted((user_name.casefold(), user_id, user_name) for user_id, user_name in roster.items())
+        self.rendered = {}
+
+    def invalidate_from(self, index: int):
+        # Inserir ou remover desloca só os nomes seguintes; páginas anteriores continuam válidas.
+        first = index // self.page_size
+        for page in [page for page in self.rendered if page >= first]:
+            del self.rendered[page]
+
+    def add(self, user_id: int, user_name: str):
+        entry = (user_name.casefold(), user_id, user_name)
+        index = bisect.bisect_left(self.entries, entry)
+        self.entries.insert(index, entry)
+        self.invalidate_from(index)
+
+    def remove(self, user_id: int, user_name: str):
+        entry = (user_name.casefold(), user_id, user_name)
+        index = bisect.bisect_left(self.entries, entry)
+        if index < len(self.entries) and self.entries[index] == entry:
+            del self.entries[index]
+            self.invalidate_from(index)
+
+    def page_entries(self, page: int):
+        return self.entries[page * self.page_size:(page + 1) * self.page_size]
 
+    def render(self, page: int):
+        text = self.rendered.get(page)
+        if text is None:
+            text = self.rendered[page] = "\n".join(user_name for _, _, user_name in self.page_entries(page))
+        return text
+
+class PVPEventState:
+    def __init__(self, guild_id: int, message_id: int, channel_id: int, title: str, description: str, created_by_name: str, week_key: str, starts_at: int = None, closed_at: int = None):
+        self.guild_id = guild_id
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.title = title
+        self.description = description
+        self.created_by_name = created_by_name
+        self.week_key = week_key
+        self.starts_at = starts_at
+        self.closed_at = closed_at
+        self.confirmados = {}
+        self.recusados = {}
+        self.rosters = None
+
+    def roster_json(self):
+        return json.dumps({
+            "confirmados": list(self.confirmados.items()),
+            "recusados": list(self.recusados.items()),
+        }, ensure_ascii=False)
+
+    def load_roster(self, roster: str):
+        data = json.loads(roster)
+        self.confirmados = {user_id: user_name for user_id, user_name in data["confirmados"]}
+        self.recusados = {user_id: user_name for user_id, user_name in data["recusados"]}
+        self.rosters = None
+
+    def set_status(self, user_id: int, user_name: str, status: str):
+        for current, roster in (("confirmado", self.confirmados), ("recusado", self.recusados)):
+            previous = roster.pop(user_id, None)
+            if previous is not None and self.rosters is not None:
+                self.rosters[current].remove(user_id, previous)
+
+        if status == "confirmado":
+            self.confirmados[user_id] = user_name
+        elif status == "recusado":
+            self.recusados[user_id] = user_name
+        else:
+            return
+
+        if self.rosters is not None:
+            self.rosters[status].add(user_id, user_name)
+
+    def roster_pages(self, status: str):
+        if self.rosters is None:
+            self.rosters = {
+                "confirmado": RosterPages(PVP_ROSTER_PAGE_SIZE),
+                "recusado": RosterPages(PVP_ROSTER_PAGE_SIZE),
+            }
+            self.rosters["confirmado"].load(self.confirmados)
+            self.rosters["recusado"].load(self.recusados)
+        return self.rosters[status]
+
+class PVPEventCache:
+    def __init__(self, capacity: int, max_age: timedelta):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.events = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def is_expired(self, message_id: int) -> bool:
+        return discord.utils.snowflake_time(message_id) < discord.utils.utcnow() - self.max_age
+
+    def put(self, event: PVPEventState):
+        with self.lock:
+            self.events[event.message_id] = event
+            self.events.move_to_end(event.message_id)
+            self.evict()
+
+    def get(self, message_id: int):
+        with self.lock:
+            event = self.events.get(message_id)
+            if event is None or self.is_expired(message_id):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.events.move_to_end(message_id)
+            return event
+
+    def set_status(self, message_id: int, user_id: int, user_name: str, status: str):
+        with self.lock:
+            event = self.events.get(message_id)
+            if event is not None:
+                event.set_status(user_id, user_name, status)
+
+    def page(self, event: PVPEventState, status: str, page: int):
+        with self.lock:
+            pages = event.roster_pages(status)
+            page = min(max(page, 0), pages.page_count - 1)
+            return pages.render(page), page, pages.page_count, pages.count, len(pages.page_entries(page))
+
+    def roster(self, event: PVPEventState):
+        # A thread do banco altera as listas em set_status; a cópia sai sob a mesma trava.
+        with self.lock:
+            return {**event.recusados, **event.confirmados}
+
+    def clear(self):
+        with self.lock:
+            self.events.clear()
+
+    def evict(self):
+        for message_id in [message_id for message_id in self.events if self.is_expired(message_id)]:
+            del self.events[message_id]
+
+        while len(self.events) > self.capacity:
+            self.events.popitem(last=False)
+
+pvp_cache = PVPEventCache(PVP_CACHE_SIZE, PVP_CACHE_MAX_AGE)
+
+def reset_memory_state():
+    farm_leaderboards.clear()
+    pvp_leaderboards.clear()
+    pvp_cache.clear()
+
+def migrate_v1(cursor: sqlite3.Cursor):
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS farms (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -75,271 +775,2854 @@ def init_db():
         )
     """)
 
-    conn.commit()
-    conn.close()
+def migrate_v2(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_farms_week_membro
+        ON farms (week_key, membro, farm_tipo, qtd)
+    """)
 
-def add_farm(membro: str, farm_tipo: str, qtd: float, admin_id: int, admin_name: str):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
     cursor.execute("""
-        INSERT INTO farms (week_key, membro, farm_tipo, qtd, admin_id, admin_name, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
-        get_week_key(),
-        membro,
-        farm_tipo,
-        qtd,
-        admin_id,
-        admin_name,
-        datetime.now().strftime("%d/%m/%Y %H:%M")
-    ))
-    conn.commit()
-    conn.close()
+        CREATE INDEX IF NOT EXISTS idx_pvp_events_week
+        ON pvp_events (week_key)
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pvp_confirmations_message_status
+        ON pvp_confirmations (message_id, status, user_name)
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pvp_confirmations_message_lower_name
+        ON pvp_confirmations (message_id, LOWER(user_name))
+    """)
+
+def migrate_v3(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS farm_rollups (
+            week_key TEXT NOT NULL,
+            membro TEXT NOT NULL,
+            pedra REAL NOT NULL DEFAULT 0,
+            semente REAL NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (week_key, membro)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pvp_rollups (
+            week_key TEXT NOT NULL,
+            user_name TEXT NOT NULL,
+            confirmados INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (week_key, user_name)
+        )
+    """)
 
-def get_farm_breakdown(limit=10):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
     cursor.execute("""
-        SELECT membro,
-               SUM(CASE WHEN farm_tipo = 'Pedra' THEN qtd ELSE 0 END) as pedra,
-               SUM(CASE WHEN farm_tipo = 'Semente' THEN qtd ELSE 0 END) as semente,
-               SUM(qtd) as total
+        INSERT INTO farm_rollups (week_key, membro, pedra, semente, total)
+        SELECT week_key,
+               membro,
+               SUM(CASE WHEN farm_tipo = 'Pedra' THEN qtd ELSE 0 END),
+               SUM(CASE WHEN farm_tipo = 'Semente' THEN qtd ELSE 0 END),
+               SUM(qtd)
         FROM farms
-        WHERE week_key = ?
-        GROUP BY membro
-        ORDER BY total DESC
-        LIMIT ?
-    """, (get_week_key(), limit))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+        GROUP BY week_key, membro
+    """)
 
-def save_pvp_event(message_id: int, channel_id: int, title: str, description: str, created_by_id: int, created_by_name: str):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
     cursor.execute("""
-        INSERT OR REPLACE INTO pvp_events
-        (message_id, channel_id, title, description, created_by_id, created_by_name, created_at, week_key)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        message_id,
-        channel_id,
-        title,
-        description,
-        created_by_id,
-        created_by_name,
-        datetime.now().strftime("%d/%m/%Y %H:%M"),
-        get_week_key()
-    ))
-    conn.commit()
-    conn.close()
+        INSERT INTO pvp_rollups (week_key, user_name, confirmados)
+        SELECT pe.week_key, pc.user_name, COUNT(*)
+        FROM pvp_confirmations pc
+        JOIN pvp_events pe ON pe.message_id = pc.message_id
+        WHERE pc.status = 'confirmado'
+        GROUP BY pe.week_key, pc.user_name
+    """)
 
-def upsert_confirmation(message_id: int, user_id: int, user_name: str, status: str):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+def migrate_v4(cursor: sqlite3.Cursor):
     cursor.execute("""
-        INSERT INTO pvp_confirmations (message_id, user_id, user_name, status, updated_at)
-        VALUES (?, ?, ?, ?, ?)
-        ON CONFLICT(message_id, user_id)
-        DO UPDATE SET
-            user_name=excluded.user_name,
-            status=excluded.status,
-            updated_at=excluded.updated_at
-    """, (
-        message_id,
-        user_id,
-        user_name,
-        status,
-        datetime.now().strftime("%d/%m/%Y %H:%M")
-    ))
-    conn.commit()
-    conn.close()
+        CREATE TABLE IF NOT EXISTS weekly_closings (
+            week_key TEXT PRIMARY KEY,
+            closed_by_id INTEGER NOT NULL,
+            closed_by_name TEXT NOT NULL,
+            closed_at TEXT NOT NULL,
+            archived_at TEXT
+        )
+    """)
 
-def delete_confirmation(message_id: int, user_id: int):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
     cursor.execute("""
-        DELETE FROM pvp_confirmations
-        WHERE message_id = ? AND user_id = ?
-    """, (message_id, user_id))
-    conn.commit()
-    conn.close()
+        CREATE TABLE IF NOT EXISTS weekly_snapshots (
+            week_key TEXT NOT NULL,
+            membro TEXT NOT NULL,
+            pedra REAL NOT NULL,
+            semente REAL NOT NULL,
+            total REAL NOT NULL,
+            pvp_confirmados INTEGER NOT NULL,
+            PRIMARY KEY (week_key, membro)
+        ) WITHOUT ROWID
+    """)
 
-def remove_member_from_event(message_id: int, member_name: str):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+def migrate_v5(cursor: sqlite3.Cursor):
     cursor.execute("""
-        DELETE FROM pvp_confirmations
-        WHERE message_id = ? AND LOWER(user_name) = LOWER(?)
-    """, (message_id, member_name))
-    deleted = cursor.rowcount
-    conn.commit()
-    conn.close()
-    return deleted
+        CREATE TABLE IF NOT EXISTS bot_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
 
-def get_event_lists(message_id: int):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+def migrate_v6(cursor: sqlite3.Cursor):
+    for table in ("farms", "pvp_events", "pvp_confirmations"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN guild_id INTEGER NOT NULL DEFAULT {GUILD_ID}")
+
+    cursor.execute("DROP INDEX IF EXISTS idx_farms_week_membro")
+    cursor.execute("DROP INDEX IF EXISTS idx_pvp_events_week")
     cursor.execute("""
-        SELECT user_name, status
-        FROM pvp_confirmations
-        WHERE message_id = ?
-        ORDER BY user_name COLLATE NOCASE
-    """, (message_id,))
-    rows = cursor.fetchall()
-    conn.close()
+        CREATE INDEX IF NOT EXISTS idx_farms_guild_week_membro
+        ON farms (guild_id, week_key, membro, farm_tipo, qtd)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pvp_events_guild_week
+        ON pvp_events (guild_id, week_key)
+    """)
+
+    cursor.execute("DROP TABLE farm_rollups")
+    cursor.execute("DROP TABLE pvp_rollups")
+    cursor.execute("""
+        CREATE TABLE farm_rollups (
+            guild_id INTEGER NOT NULL,
+            week_key TEXT NOT NULL,
+            membro TEXT NOT NULL,
+            pedra REAL NOT NULL DEFAULT 0,
+            semente REAL NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, week_key, membro)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE pvp_rollups (
+            guild_id INTEGER NOT NULL,
+            week_key TEXT NOT NULL,
+            user_name TEXT NOT NULL,
+            confirmados INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, week_key, user_name)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO farm_rollups (guild_id, week_key, membro, pedra, semente, total)
+        SELECT guild_id,
+               week_key,
+               membro,
+               SUM(CASE WHEN farm_tipo = 'Pedra' THEN qtd ELSE 0 END),
+               SUM(CASE WHEN farm_tipo = 'Semente' THEN qtd ELSE 0 END),
+               SUM(qtd)
+        FROM farms
+        GROUP BY guild_id, week_key, membro
+    """)
+    cursor.execute("""
+        INSERT INTO pvp_rollups (guild_id, week_key, user_name, confirmados)
+        SELECT pe.guild_id, pe.week_key, pc.user_name, COUNT(*)
+        FROM pvp_confirmations pc
+        JOIN pvp_events pe ON pe.message_id = pc.message_id
+        WHERE pc.status = 'confirmado'
+        GROUP BY pe.guild_id, pe.week_key, pc.user_name
+    """)
+
+    cursor.execute("ALTER TABLE weekly_closings RENAME TO weekly_closings_v5")
+    cursor.execute("""
+        CREATE TABLE weekly_closings (
+            guild_id INTEGER NOT NULL,
+            week_key TEXT NOT NULL,
+            closed_by_id INTEGER NOT NULL,
+            closed_by_name TEXT NOT NULL,
+            closed_at TEXT NOT NULL,
+            archived_at TEXT,
+            PRIMARY KEY (guild_id, week_key)
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO weekly_closings (guild_id, week_key, closed_by_id, closed_by_name, closed_at, archived_at)
+        SELECT {GUILD_ID}, week_key, closed_by_id, closed_by_name, closed_at, archived_at
+        FROM weekly_closings_v5
+    """)
+    cursor.execute("DROP TABLE weekly_closings_v5")
+
+    cursor.execute("ALTER TABLE weekly_snapshots RENAME TO weekly_snapshots_v5")
+    cursor.execute("""
+        CREATE TABLE weekly_snapshots (
+            guild_id INTEGER NOT NULL,
+            week_key TEXT NOT NULL,
+            membro TEXT NOT NULL,
+            pedra REAL NOT NULL,
+            semente REAL NOT NULL,
+            total REAL NOT NULL,
+            pvp_confirmados INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, week_key, membro)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(f"""
+        INSERT INTO weekly_snapshots (guild_id, week_key, membro, pedra, semente, total, pvp_confirmados)
+        SELECT {GUILD_ID}, week_key, membro, pedra, semente, total, pvp_confirmados
+        FROM weekly_snapshots_v5
+    """)
+    cursor.execute("DROP TABLE weekly_snapshots_v5")
+
+def migrate_v7(cursor: sqlite3.Cursor):
+    cursor.execute("ALTER TABLE farms ADD COLUMN membro_id INTEGER")
+
+    # Farms antigos só têm o nome digitado; cada nome distinto recebe um ID negativo
+    # até ser associado a um membro real em reconcile_legacy_farm_members.
+    cursor.execute("""
+        CREATE TEMP TABLE legacy_membros AS
+        SELECT guild_id,
+               LOWER(membro) AS nome,
+               -ROW_NUMBER() OVER (ORDER BY guild_id, LOWER(membro)) AS membro_id
+        FROM farms
+        GROUP BY guild_id, LOWER(membro)
+    """)
+    cursor.execute("""
+        UPDATE farms
+        SET membro_id = (
+            SELECT lm.membro_id FROM legacy_membros lm
+            WHERE lm.guild_id = farms.guild_id AND lm.nome = LOWER(farms.membro)
+        )
+    """)
+    cursor.execute("DROP TABLE legacy_membros")
+
+    cursor.execute("DROP INDEX IF EXISTS idx_farms_guild_week_membro")
+    cursor.execute("DROP INDEX IF EXISTS idx_pvp_confirmations_message_lower_name")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_farms_guild_week_membro_id
+        ON farms (guild_id, week_key, membro_id, farm_tipo, qtd)
+    """)
+
+    cursor.execute("DROP TABLE farm_rollups")
+    cursor.execute("""
+        CREATE TABLE farm_rollups (
+            guild_id INTEGER NOT NULL,
+            week_key TEXT NOT NULL,
+            membro_id INTEGER NOT NULL,
+            membro TEXT NOT NULL,
+            pedra REAL NOT NULL DEFAULT 0,
+            semente REAL NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, week_key, membro_id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO farm_rollups (guild_id, week_key, membro_id, membro, pedra, semente, total)
+        SELECT guild_id, week_key, membro_id, membro, pedra, semente, total
+        FROM (
+            SELECT guild_id,
+                   week_key,
+                   membro_id,
+                   membro,
+                   MAX(id),
+                   SUM(CASE WHEN farm_tipo = 'Pedra' THEN qtd ELSE 0 END) AS pedra,
+                   SUM(CASE WHEN farm_tipo = 'Semente' THEN qtd ELSE 0 END) AS semente,
+                   SUM(qtd) AS total
+            FROM farms
+            GROUP BY guild_id, week_key, membro_id
+        )
+    """)
+
+def migrate_v8(cursor: sqlite3.Cursor):
+    cursor.execute("DROP TABLE pvp_rollups")
+    cursor.execute("""
+        CREATE TABLE pvp_rollups (
+            guild_id INTEGER NOT NULL,
+            week_key TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            user_name TEXT NOT NULL,
+            confirmados INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, week_key, user_id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO pvp_rollups (guild_id, week_key, user_id, user_name, confirmados)
+        SELECT guild_id, week_key, user_id, user_name, confirmados
+        FROM (
+            SELECT pe.guild_id,
+                   pe.week_key,
+                   pc.user_id,
+                   pc.user_name,
+                   MAX(pc.id),
+                   COUNT(*) AS confirmados
+            FROM pvp_confirmations pc
+            JOIN pvp_events pe ON pe.message_id = pc.message_id
+            WHERE pc.status = 'confirmado'
+            GROUP BY pe.guild_id, pe.week_key, pc.user_id
+        )
+    """)
+
+    cursor.execute("ALTER TABLE weekly_snapshots RENAME TO weekly_snapshots_v7")
+    cursor.execute("""
+        CREATE TABLE weekly_snapshots (
+            guild_id INTEGER NOT NULL,
+            week_key TEXT NOT NULL,
+            membro_id INTEGER NOT NULL,
+            membro TEXT NOT NULL,
+            pedra REAL NOT NULL,
+            semente REAL NOT NULL,
+            total REAL NOT NULL,
+            pvp_confirmados INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, week_key, membro_id)
+        ) WITHOUT ROWID
+    """)
+    # Snapshots antigos foram gravados por nome; recebem IDs negativos só para manter a chave única.
+    cursor.execute("""
+        INSERT INTO weekly_snapshots (guild_id, week_key, membro_id, membro, pedra, semente, total, pvp_confirmados)
+        SELECT guild_id,
+               week_key,
+               -ROW_NUMBER() OVER (PARTITION BY guild_id, week_key ORDER BY membro),
+               membro,
+               pedra,
+               semente,
+               total,
+               pvp_confirmados
+        FROM weekly_snapshots_v7
+    """)
+    cursor.execute("DROP TABLE weekly_snapshots_v7")
+
+def legacy_timestamp(value):
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(datetime.strptime(value, "%d/%m/%Y %H:%M").timestamp())
+    except ValueError:
+        return 0
+
+def migrate_v9(cursor: sqlite3.Cursor):
+    # As datas eram gravadas como texto no horário local da máquina; viram epoch UTC.
+    cursor.connection.create_function("legacy_timestamp", 1, legacy_timestamp, deterministic=True)
+
+    cursor.execute("""
+        CREATE TABLE farms_v9 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            week_key TEXT NOT NULL,
+            membro_id INTEGER,
+            membro TEXT NOT NULL,
+            farm_tipo TEXT NOT NULL,
+            qtd REAL NOT NULL,
+            admin_id INTEGER NOT NULL,
+            admin_name TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO farms_v9 (id, guild_id, week_key, membro_id, membro, farm_tipo, qtd, admin_id, admin_name, created_at)
+        SELECT id, guild_id, week_key, membro_id, membro, farm_tipo, qtd, admin_id, admin_name, legacy_timestamp(created_at)
+        FROM farms
+    """)
+    cursor.execute("DROP TABLE farms")
+    cursor.execute("ALTER TABLE farms_v9 RENAME TO farms")
+    cursor.execute("""
+        CREATE INDEX idx_farms_guild_week_membro_id
+        ON farms (guild_id, week_key, membro_id, farm_tipo, qtd)
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_farms_guild_created
+        ON farms (guild_id, created_at, membro_id, membro, qtd)
+    """)
+
+    cursor.execute("""
+        CREATE TABLE pvp_events_v9 (
+            message_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            week_key TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            created_by_id INTEGER NOT NULL,
+            created_by_name TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO pvp_events_v9 (message_id, guild_id, channel_id, week_key, title, description, created_by_id, created_by_name, created_at)
+        SELECT message_id, guild_id, channel_id, week_key, title, description, created_by_id, created_by_name, legacy_timestamp(created_at)
+        FROM pvp_events
+    """)
+    cursor.execute("DROP TABLE pvp_events")
+    cursor.execute("ALTER TABLE pvp_events_v9 RENAME TO pvp_events")
+    cursor.execute("""
+        CREATE INDEX idx_pvp_events_guild_week
+        ON pvp_events (guild_id, week_key)
+    """)
+
+    cursor.execute("""
+        CREATE TABLE pvp_confirmations_v9 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            user_name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            updated_at INTEGER NOT NULL,
+            UNIQUE(message_id, user_id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO pvp_confirmations_v9 (id, guild_id, message_id, user_id, user_name, status, updated_at)
+        SELECT id, guild_id, message_id, user_id, user_name, status, legacy_timestamp(updated_at)
+        FROM pvp_confirmations
+    """)
+    cursor.execute("DROP TABLE pvp_confirmations")
+    cursor.execute("ALTER TABLE pvp_confirmations_v9 RENAME TO pvp_confirmations")
+    cursor.execute("""
+        CREATE INDEX idx_pvp_confirmations_message_status
+        ON pvp_confirmations (message_id, status, user_name)
+    """)
+
+    cursor.execute("""
+        CREATE TABLE weekly_closings_v9 (
+            guild_id INTEGER NOT NULL,
+            week_key TEXT NOT NULL,
+            closed_by_id INTEGER NOT NULL,
+            closed_by_name TEXT NOT NULL,
+            closed_at INTEGER NOT NULL,
+            archived_at INTEGER,
+            PRIMARY KEY (guild_id, week_key)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO weekly_closings_v9 (guild_id, week_key, closed_by_id, closed_by_name, closed_at, archived_at)
+        SELECT guild_id, week_key, closed_by_id, closed_by_name, legacy_timestamp(closed_at), legacy_timestamp(archived_at)
+        FROM weekly_closings
+    """)
+    cursor.execute("DROP TABLE weekly_closings")
+    cursor.execute("ALTER TABLE weekly_closings_v9 RENAME TO weekly_closings")
+
+def migrate_v10(cursor: sqlite3.Cursor):
+    cursor.execute("ALTER TABLE pvp_events ADD COLUMN starts_at INTEGER")
+    cursor.execute("ALTER TABLE pvp_events ADD COLUMN closed_at INTEGER")
+    cursor.execute("ALTER TABLE pvp_events ADD COLUMN roster TEXT")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pvp_events_open
+        ON pvp_events (created_at)
+        WHERE closed_at IS NULL
+    """)
+
+def migrate_v11(cursor: sqlite3.Cursor):
+    cursor.execute("ALTER TABLE weekly_closings ADD COLUMN published_at INTEGER")
+    # Semanas fechadas antes desta versão já foram publicadas pelo /fechamento ou pelo agendador.
+    cursor.execute("UPDATE weekly_closings SET published_at = closed_at")
+
+def migrate_v12(cursor: sqlite3.Cursor):
+    cursor.connection.create_function("legacy_timestamp", 1, legacy_timestamp, deterministic=True)
+    cursor.execute("""
+        CREATE TABLE schema_version_v12 (
+            version INTEGER PRIMARY KEY,
+            applied_at INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO schema_version_v12 (version, applied_at)
+        SELECT version, legacy_timestamp(applied_at)
+        FROM schema_version
+    """)
+    cursor.execute("DROP TABLE schema_version")
+    cursor.execute("ALTER TABLE schema_version_v12 RENAME TO schema_version")
+
+MIGRATIONS = [
+    migrate_v1,
+    migrate_v2,
+    migrate_v3,
+    migrate_v4,
+    migrate_v5,
+    migrate_v6,
+    migrate_v7,
+    migrate_v8,
+    migrate_v9,
+    migrate_v10,
+    migrate_v11,
+    migrate_v12,
+]
+
+def guild_filter(column: str, guild_id: int = None):
+    # Sem servidor informado, a reconstrução cobre o banco inteiro (ex.: `python main.py rebuild`).
+    if guild_id is None:
+        return "1", ()
+    return f"{column} = ?", (guild_id,)
+
+def populate_rollups(cursor: sqlite3.Cursor, guild_id: int = None):
+    farms_scope, farms_params = guild_filter("guild_id", guild_id)
+    events_scope, events_params = guild_filter("pe.guild_id", guild_id)
+    # Rollups de semanas arquivadas são mantidos pela reconstrução, então não são gerados de novo.
+    archived = "SELECT guild_id, week_key FROM weekly_closings WHERE archived_at IS NOT NULL"
+
+    # MAX(id) faz o SQLite devolver o nome da linha mais recente de cada membro.
+    cursor.execute(f"""
+        INSERT INTO farm_rollups (guild_id, week_key, membro_id, membro, pedra, semente, total)
+        SELECT guild_id, week_key, membro_id, membro, pedra, semente, total
+        FROM (
+            SELECT guild_id,
+                   week_key,
+                   membro_id,
+                   membro,
+                   MAX(id),
+                   SUM(CASE WHEN farm_tipo = 'Pedra' THEN qtd ELSE 0 END) AS pedra,
+                   SUM(CASE WHEN farm_tipo = 'Semente' THEN qtd ELSE 0 END) AS semente,
+                   SUM(qtd) AS total
+            FROM farms
+            WHERE {farms_scope} AND (guild_id, week_key) NOT IN ({archived})
+            GROUP BY guild_id, week_key, membro_id
+        )
+    """, farms_params)
+
+    # Eventos encerrados contam pela lista congelada em pvp_events.roster, já que suas
+    # confirmações podem ter sido movidas para o arquivo.
+    cursor.execute(f"""
+        INSERT INTO pvp_rollups (guild_id, week_key, user_id, user_name, confirmados)
+        SELECT guild_id, week_key, user_id, user_name, confirmados
+        FROM (
+            SELECT guild_id, week_key, user_id, user_name, MAX(message_id), COUNT(*) AS confirmados
+            FROM (
+                SELECT pe.guild_id, pe.week_key, pc.user_id, pc.user_name, pe.message_id
+                FROM pvp_confirmations pc
+                JOIN pvp_events pe ON pe.message_id = pc.message_id
+                WHERE pc.status = 'confirmado' AND pe.closed_at IS NULL AND {events_scope}
+                  AND (pe.guild_id, pe.week_key) NOT IN ({archived})
+                UNION ALL
+                SELECT pe.guild_id,
+                       pe.week_key,
+                       json_extract(roster.value, '$[0]'),
+                       json_extract(roster.value, '$[1]'),
+                       pe.message_id
+                FROM pvp_events pe, json_each(pe.roster, '$.confirmados') roster
+                WHERE pe.closed_at IS NOT NULL AND {events_scope}
+                  AND (pe.guild_id, pe.week_key) NOT IN ({archived})
+            )
+            GROUP BY guild_id, week_key, user_id
+        )
+    """, events_params * 2)
+
+def get_state(conn: sqlite3.Connection, key: str):
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM bot_state WHERE key = ?", (key,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+@journaled
+def set_state(conn: sqlite3.Connection, key: str, value: str):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO bot_state (key, value)
+        VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value=excluded.value
+    """, (key, value))
+
+def get_schema_version(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_at INTEGER NOT NULL
+        )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def init_db(conn: sqlite3.Connection):
+    current = get_schema_version(conn)
+
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if version <= current:
+            continue
+
+        conn.execute("BEGIN")
+        try:
+            migration(conn.cursor())
+            conn.execute(
+                "INSERT INTO schema_version (version, applied_at) VALUES (?, ?)",
+                (version, get_timestamp())
+            )
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+
+        print(f"Migração de schema v{version} aplicada.")
+
+    conn.execute("PRAGMA optimize")
+
+@journaled
+def add_farm(conn: sqlite3.Connection, guild_id: int, membro_id: int, membro: str, farm_tipo: str, qtd: float, admin_id: int, admin_name: str):
+    week_key = get_week_key()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO farms (guild_id, week_key, membro_id, membro, farm_tipo, qtd, admin_id, admin_name, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        guild_id,
+        week_key,
+        membro_id,
+        membro,
+        farm_tipo,
+        qtd,
+        admin_id,
+        admin_name,
+        get_timestamp()
+    ))
+
+    pedra = qtd if farm_tipo == "Pedra" else 0
+    semente = qtd if farm_tipo == "Semente" else 0
+    cursor.execute("""
+        INSERT INTO farm_rollups (guild_id, week_key, membro_id, membro, pedra, semente, total)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(guild_id, week_key, membro_id)
+        DO UPDATE SET
+            membro=excluded.membro,
+            pedra=pedra + excluded.pedra,
+            semente=semente + excluded.semente,
+            total=total + excluded.total
+    """, (guild_id, week_key, membro_id, membro, pedra, semente, qtd))
+
+    farm_leaderboards[guild_id].add(week_key, membro_id, membro, (pedra, semente, qtd))
+
+@journaled
+def add_farms_bulk(conn: sqlite3.Connection, guild_id: int, rows, admin_id: int, admin_name: str):
+    week_key = get_week_key()
+    created_at = get_timestamp()
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO farms (guild_id, week_key, membro_id, membro, farm_tipo, qtd, admin_id, admin_name, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (guild_id, week_key, membro_id, membro, farm_tipo, qtd, admin_id, admin_name, created_at)
+        for membro_id, membro, farm_tipo, qtd in rows
+    ))
+
+    totals = {}
+    names = {}
+    for membro_id, membro, farm_tipo, qtd in rows:
+        values = totals.setdefault(membro_id, [0, 0, 0])
+        values[0 if farm_tipo == "Pedra" else 1] += qtd
+        values[2] += qtd
+        names[membro_id] = membro
+
+    cursor.executemany("""
+        INSERT INTO farm_rollups (guild_id, week_key, membro_id, membro, pedra, semente, total)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(guild_id, week_key, membro_id)
+        DO UPDATE SET
+            membro=excluded.membro,
+            pedra=pedra + excluded.pedra,
+            semente=semente + excluded.semente,
+            total=total + excluded.total
+    """, ((guild_id, week_key, membro_id, names[membro_id], *values) for membro_id, values in totals.items()))
+
+    leaderboard = farm_leaderboards[guild_id]
+    for membro_id, values in totals.items():
+        leaderboard.add(week_key, membro_id, names[membro_id], values)
+
+    return totals
+
+def parse_farm_lines(text: str):
+    rows = []
+    errors = []
+    farm_types = {farm_tipo.lower(): farm_tipo for farm_tipo in FARM_TYPES}
+
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        parts = [part.strip() for part in line.split(";")]
+        if number == 1 and [part.lower() for part in parts] == ["membro", "tipo", "qtd"]:
+            continue
+
+        if len(parts) != 3 or not parts[0]:
+            errors.append(f"Linha {number}: use o formato `membro;tipo;qtd`.")
+            continue
+
+        membro, tipo, qtd = parts
+        farm_tipo = farm_types.get(tipo.lower())
+        if farm_tipo is None:
+            errors.append(f"Linha {number}: tipo `{tipo}` inválido (use {' ou '.join(FARM_TYPES)}).")
+            continue
+
+        try:
+            qtd = float(qtd.replace(",", "."))
+        except ValueError:
+            errors.append(f"Linha {number}: quantidade `{qtd}` inválida.")
+            continue
+
+        rows.append((number, membro, farm_tipo, qtd))
+
+    return rows, errors
+
+def resolve_farm_members(index: MemberIndex, parsed):
+    rows = []
+    errors = []
+    for number, membro, farm_tipo, qtd in parsed:
+        membro_id = index.resolve(membro)
+        if membro_id is None:
+            errors.append(f"Linha {number}: membro `{membro}` não encontrado ou ambíguo (use o ID ou a menção).")
+            continue
+        rows.append((membro_id, index.names[membro_id], farm_tipo, qtd))
+    return rows, errors
+
+def prepare_farm_batch(content, index: MemberIndex):
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig", errors="replace")
+
+    # Conta as linhas antes de interpretar; a folga de uma linha é para o cabeçalho opcional.
+    lines = content.count("\n") + (0 if content.endswith("\n") else 1)
+    if lines > FARM_BULK_MAX_LINES + 1:
+        return [], [f"O lote tem {lines} linhas; o limite é {FARM_BULK_MAX_LINES}."]
+
+    parsed, errors = parse_farm_lines(content)
+    rows, member_errors = resolve_farm_members(index, parsed)
+    errors.extend(member_errors)
+    return rows, errors
+
+def get_farm_breakdown(conn: sqlite3.Connection, guild_id: int, limit=10):
+    week_key = get_week_key()
+    leaderboard = farm_leaderboards[guild_id]
+    if leaderboard.week_key != week_key:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT membro_id, membro, pedra, semente, total
+            FROM farm_rollups
+            WHERE guild_id = ? AND week_key = ?
+        """, (guild_id, week_key))
+        leaderboard.load(week_key, cursor.fetchall())
+
+    return leaderboard.top(limit)
+
+def get_week_ranking(conn: sqlite3.Connection, guild_id: int, week_key: str, limit=10):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT membro_id, membro, pedra, semente, total
+        FROM farm_rollups
+        WHERE guild_id = ? AND week_key = ?
+        ORDER BY total DESC
+        LIMIT ?
+    """, (guild_id, week_key, limit))
+    return cursor.fetchall()
+
+def get_legacy_farm_members(conn: sqlite3.Connection, guild_id: int):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT membro_id, MAX(membro)
+        FROM farms
+        WHERE guild_id = ? AND membro_id < 0
+        GROUP BY membro_id
+    """, (guild_id,))
+    return cursor.fetchall()
+
+@journaled
+def assign_legacy_farm_members(conn: sqlite3.Connection, guild_id: int, assignments):
+    cursor = conn.cursor()
+    cursor.executemany("""
+        UPDATE farms
+        SET membro_id = ?
+        WHERE guild_id = ? AND membro_id = ?
+    """, ((membro_id, guild_id, legacy_id) for legacy_id, membro_id in assignments))
+    updated = cursor.rowcount
+
+    rebuild_rollups(conn, guild_id)
+
+    return updated
+
+@journaled
+def refresh_pvp_user_names(conn: sqlite3.Connection, guild_id: int, names: dict):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS member_names (
+            user_id INTEGER PRIMARY KEY,
+            user_name TEXT NOT NULL
+        )
+    """)
+    cursor.execute("DELETE FROM temp.member_names")
+    cursor.executemany("INSERT INTO temp.member_names (user_id, user_name) VALUES (?, ?)", names.items())
+
+    cursor.execute("""
+        UPDATE pvp_confirmations
+        SET user_name = mn.user_name
+        FROM temp.member_names mn
+        WHERE pvp_confirmations.user_id = mn.user_id
+          AND pvp_confirmations.guild_id = ?
+          AND pvp_confirmations.user_name != mn.user_name
+    """, (guild_id,))
+    updated = cursor.rowcount
+    cursor.execute("""
+        UPDATE pvp_rollups
+        SET user_name = mn.user_name
+        FROM temp.member_names mn
+        WHERE pvp_rollups.user_id = mn.user_id
+          AND pvp_rollups.guild_id = ?
+          AND pvp_rollups.user_name != mn.user_name
+    """, (guild_id,))
+    cursor.execute("DELETE FROM temp.member_names")
+
+    pvp_leaderboards[guild_id].invalidate()
+    if updated:
+        warm_pvp_cache(conn)
+
+    return updated
+
+def update_pvp_rollup(conn: sqlite3.Connection, message_id: int, user_id: int, user_name: str, delta: int):
+    cursor = conn.cursor()
+    cursor.execute("SELECT guild_id, week_key FROM pvp_events WHERE message_id = ?", (message_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return
+
+    guild_id, week_key = row
+    cursor.execute("""
+        INSERT INTO pvp_rollups (guild_id, week_key, user_id, user_name, confirmados)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(guild_id, week_key, user_id)
+        DO UPDATE SET
+            user_name=excluded.user_name,
+            confirmados=confirmados + excluded.confirmados
+    """, (guild_id, week_key, user_id, user_name, delta))
+    cursor.execute("""
+        DELETE FROM pvp_rollups
+        WHERE guild_id = ? AND week_key = ? AND user_id = ? AND confirmados <= 0
+    """, (guild_id, week_key, user_id))
+
+    pvp_leaderboards[guild_id].add(week_key, user_id, user_name, (delta,))
+
+def update_event_rollups(conn: sqlite3.Connection, message_id: int, delta: int):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT user_id, user_name
+        FROM pvp_confirmations
+        WHERE message_id = ? AND status = 'confirmado'
+    """, (message_id,))
+    for user_id, user_name in cursor.fetchall():
+        update_pvp_rollup(conn, message_id, user_id, user_name, delta)
+
+@journaled
+def save_pvp_event(conn: sqlite3.Connection, guild_id: int, message_id: int, channel_id: int, title: str, description: str, created_by_id: int, created_by_name: str, starts_at: int = None):
+    update_event_rollups(conn, message_id, -1)
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT OR REPLACE INTO pvp_events
+        (guild_id, message_id, channel_id, title, description, created_by_id, created_by_name, created_at, week_key, starts_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        guild_id,
+        message_id,
+        channel_id,
+        title,
+        description,
+        created_by_id,
+        created_by_name,
+        get_timestamp(),
+        get_week_key(),
+        starts_at
+    ))
+
+    update_event_rollups(conn, message_id, 1)
+    return load_pvp_event(conn, message_id)
+
+def get_confirmation(conn: sqlite3.Connection, message_id: int, user_id: int):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT user_name, status
+        FROM pvp_confirmations
+        WHERE message_id = ? AND user_id = ?
+    """, (message_id, user_id))
+    return cursor.fetchone()
+
+def is_pvp_event_closed(conn: sqlite3.Connection, message_id: int):
+    cursor = conn.cursor()
+    cursor.execute("SELECT closed_at FROM pvp_events WHERE message_id = ?", (message_id,))
+    row = cursor.fetchone()
+    return row is not None and row[0] is not None
+
+@journaled
+def upsert_confirmation(conn: sqlite3.Connection, guild_id: int, message_id: int, user_id: int, user_name: str, status: str):
+    if is_pvp_event_closed(conn, message_id):
+        return False
+
+    previous = get_confirmation(conn, message_id, user_id)
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO pvp_confirmations (guild_id, message_id, user_id, user_name, status, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(message_id, user_id)
+        DO UPDATE SET
+            user_name=excluded.user_name,
+            status=excluded.status,
+            updated_at=excluded.updated_at
+    """, (
+        guild_id,
+        message_id,
+        user_id,
+        user_name,
+        status,
+        get_timestamp()
+    ))
+
+    if previous is not None and previous[1] == "confirmado":
+        update_pvp_rollup(conn, message_id, user_id, previous[0], -1)
+    if status == "confirmado":
+        update_pvp_rollup(conn, message_id, user_id, user_name, 1)
+
+    pvp_cache.set_status(message_id, user_id, user_name, status)
+    return True
+
+@journaled
+def delete_confirmation(conn: sqlite3.Connection, message_id: int, user_id: int):
+    if is_pvp_event_closed(conn, message_id):
+        return False
+
+    previous = get_confirmation(conn, message_id, user_id)
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        DELETE FROM pvp_confirmations
+        WHERE message_id = ? AND user_id = ?
+    """, (message_id, user_id))
+
+    if previous is not None and previous[1] == "confirmado":
+        update_pvp_rollup(conn, message_id, user_id, previous[0], -1)
+
+    pvp_cache.set_status(message_id, user_id, None, None)
+    return True
+
+@journaled
+def remove_member_from_event(conn: sqlite3.Connection, guild_id: int, message_id: int, user_id: int):
+    if is_pvp_event_closed(conn, message_id):
+        return None
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT user_name, status
+        FROM pvp_confirmations
+        WHERE message_id = ? AND user_id = ? AND guild_id = ?
+    """, (message_id, user_id, guild_id))
+    row = cursor.fetchone()
+    if row is None:
+        return 0
+
+    cursor.execute("""
+        DELETE FROM pvp_confirmations
+        WHERE message_id = ? AND user_id = ?
+    """, (message_id, user_id))
+    deleted = cursor.rowcount
+
+    user_name, status = row
+    if status == "confirmado":
+        update_pvp_rollup(conn, message_id, user_id, user_name, -1)
+    pvp_cache.set_status(message_id, user_id, None, None)
+
+    return deleted
+
+def load_pvp_event(conn: sqlite3.Connection, message_id: int):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT guild_id, message_id, channel_id, title, description, created_by_name, week_key, starts_at, closed_at, roster
+        FROM pvp_events
+        WHERE message_id = ?
+    """, (message_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    event = PVPEventState(*row[:-1])
+    if row[-1] is not None:
+        event.load_roster(row[-1])
+        pvp_cache.put(event)
+        return event
+
+    cursor.execute("""
+        SELECT user_id, user_name, status
+        FROM pvp_confirmations
+        WHERE message_id = ?
+    """, (message_id,))
+    for user_id, user_name, status in cursor.fetchall():
+        event.set_status(user_id, user_name, status)
+
+    pvp_cache.put(event)
+    return event
+
+def warm_pvp_cache(conn: sqlite3.Connection):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT guild_id, message_id, channel_id, title, description, created_by_name, week_key, starts_at, closed_at, roster
+        FROM pvp_events
+        ORDER BY message_id DESC
+        LIMIT ?
+    """, (PVP_CACHE_SIZE,))
+    events = {}
+    rosters = {}
+    for row in cursor.fetchall():
+        if pvp_cache.is_expired(row[1]):
+            continue
+        events[row[1]] = PVPEventState(*row[:-1])
+        if row[-1] is not None:
+            rosters[row[1]] = row[-1]
+    if not events:
+        return 0
+
+    cursor.execute("""
+        SELECT message_id, user_id, user_name, status
+        FROM pvp_confirmations
+        WHERE message_id >= ?
+    """, (min(events),))
+    for message_id, user_id, user_name, status in cursor.fetchall():
+        event = events.get(message_id)
+        if event is not None and message_id not in rosters:
+            event.set_status(user_id, user_name, status)
+
+    for message_id, roster in rosters.items():
+        events[message_id].load_roster(roster)
+
+    for message_id in sorted(events):
+        pvp_cache.put(events[message_id])
+
+    return len(events)
+
+@journaled
+def close_pvp_event(conn: sqlite3.Connection, message_id: int, guild_id: int = None):
+    event = load_pvp_event(conn, message_id)
+    if event is None or event.closed_at is not None:
+        return None
+    if guild_id is not None and event.guild_id != guild_id:
+        return None
+
+    event.closed_at = get_timestamp()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE pvp_events
+        SET closed_at = ?, roster = ?
+        WHERE message_id = ? AND closed_at IS NULL
+    """, (event.closed_at, event.roster_json(), message_id))
+
+    pvp_cache.put(event)
+    return event
+
+def get_due_pvp_events(conn: sqlite3.Connection, now: int):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT message_id, channel_id
+        FROM pvp_events
+        WHERE closed_at IS NULL
+          AND (starts_at <= ? OR (starts_at IS NULL AND created_at <= ?))
+    """, (now - int(PVP_EVENT_DURATION.total_seconds()), now - int(PVP_EVENT_MAX_OPEN.total_seconds())))
+    return cursor.fetchall()
+
+@journaled
+def prune_closed_pvp_events(conn: sqlite3.Connection, closed_before: int):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT 1
+        FROM pvp_confirmations
+        WHERE message_id IN (SELECT message_id FROM pvp_events WHERE closed_at <= ?)
+        LIMIT 1
+    """, (closed_before,))
+    if cursor.fetchone() is None:
+        return 0
+
+    with archive_transaction(conn):
+        moved = copy_to_archive(
+            cursor,
+            "pvp_confirmations",
+            "message_id IN (SELECT message_id FROM main.pvp_events WHERE closed_at <= ?)",
+            (closed_before,)
+        )
+
+    return moved
+
+def get_top_pvp(conn: sqlite3.Connection, guild_id: int, limit=10):
+    week_key = get_week_key()
+    leaderboard = pvp_leaderboards[guild_id]
+    if leaderboard.week_key != week_key:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT user_id, user_name, confirmados
+            FROM pvp_rollups
+            WHERE guild_id = ? AND week_key = ?
+        """, (guild_id, week_key))
+        leaderboard.load(week_key, cursor.fetchall())
+
+    return leaderboard.top(limit)
+
+def rebuild_rollups(conn: sqlite3.Connection, guild_id: int = None):
+    scope, params = guild_filter("guild_id", guild_id)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT guild_id, week_key, membro_id, pedra, semente, total FROM farm_rollups WHERE {scope}", params)
+    farms_before = {row[:3]: row[3:] for row in cursor.fetchall()}
+    cursor.execute(f"SELECT guild_id, week_key, user_id, confirmados FROM pvp_rollups WHERE {scope}", params)
+    pvp_before = {row[:3]: row[3:] for row in cursor.fetchall()}
+
+    # Semanas arquivadas não têm mais registros brutos; seus rollups alimentam o /historico.
+    archived = f"""
+        {scope} AND (guild_id, week_key) NOT IN (
+            SELECT guild_id, week_key FROM weekly_closings WHERE archived_at IS NOT NULL AND {scope}
+        )
+    """
+    cursor.execute(f"DELETE FROM farm_rollups WHERE {archived}", params * 2)
+    cursor.execute(f"DELETE FROM pvp_rollups WHERE {archived}", params * 2)
+    populate_rollups(cursor, guild_id)
+
+    cursor.execute(f"SELECT guild_id, week_key, membro_id, pedra, semente, total FROM farm_rollups WHERE {scope}", params)
+    farms_after = {row[:3]: row[3:] for row in cursor.fetchall()}
+    cursor.execute(f"SELECT guild_id, week_key, user_id, confirmados FROM pvp_rollups WHERE {scope}", params)
+    pvp_after = {row[:3]: row[3:] for row in cursor.fetchall()}
+
+    if guild_id is None:
+        farm_leaderboards.clear()
+        pvp_leaderboards.clear()
+    else:
+        farm_leaderboards.pop(guild_id, None)
+        pvp_leaderboards.pop(guild_id, None)
+
+    return count_rollup_differences(farms_before, farms_after), count_rollup_differences(pvp_before, pvp_after)
+
+def snapshot_database(conn: sqlite3.Connection, journal: CommandJournal):
+    seq = journal.flush()
+    temp_path = f"{journal.snapshot_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    conn.execute("VACUUM INTO ?", (temp_path,))
+    snapshot = sqlite3.connect(temp_path)
+    try:
+        with snapshot:
+            set_state(snapshot, "journal_seq", str(seq))
+    finally:
+        snapshot.close()
+
+    os.replace(temp_path, journal.snapshot_path)
+    journal.truncate(seq)
+    return seq
+
+def rebuild_from_journal(snapshot_path: str, journal_path: str, output_path: str):
+    if not os.path.exists(snapshot_path):
+        print(f"❌ Snapshot {snapshot_path} não encontrado.")
+        return None
+
+    shutil.copyfile(snapshot_path, output_path)
+    conn = sqlite3.connect(output_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    try:
+        init_db(conn)
+        seq = int(get_state(conn, "journal_seq") or 0)
+        start_seq = seq
+        replayed = 0
+        operations = defaultdict(int)
+        start = time.perf_counter()
+
+        with open(journal_path, "rb") if os.path.exists(journal_path) else io.BytesIO() as f:
+            conn.execute("BEGIN")
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    print(f"Diário cortado após a entrada {seq}; o restante foi ignorado.")
+                    break
+                if entry["seq"] <= seq:
+                    continue
+
+                frozen_clock.timestamp = entry["ts"]
+                journal_replay.active = True
+                try:
+                    journal_operations[entry["op"]](conn, *entry["args"], **entry["kwargs"])
+                finally:
+                    frozen_clock.timestamp = None
+                    journal_replay.active = False
+
+                seq = entry["seq"]
+                replayed += 1
+                operations[entry["op"]] += 1
+                if replayed % JOURNAL_REPLAY_BATCH == 0:
+                    conn.commit()
+                    conn.execute("BEGIN")
+
+            set_state(conn, "journal_seq", str(seq))
+            conn.commit()
+
+        elapsed = time.perf_counter() - start
+        farm_differences, pvp_differences = rebuild_rollups(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"Banco reconstruído em {output_path} a partir do snapshot (entrada {start_seq}) até a entrada {seq}.")
+    for op, count in sorted(operations.items()):
+        print(f"  {op}: {count}")
+    print(
+        f"{replayed} operações reaplicadas em {elapsed:.2f}s "
+        f"({replayed / elapsed if elapsed > 0 else 0:.0f} operações/s). "
+        f"Divergências nos rollups: farms {farm_differences}, PVP {pvp_differences}."
+    )
+    return replayed, elapsed
+
+def get_farm_rate(conn: sqlite3.Connection, guild_id: int, since: int, bucket_seconds: int, buckets: int):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT membro_id, MAX(membro), (created_at - ?) / ? AS bucket, SUM(qtd)
+        FROM farms
+        WHERE guild_id = ? AND created_at >= ?
+        GROUP BY membro_id, bucket
+    """, (since, bucket_seconds, guild_id, since))
+
+    members = {}
+    for membro_id, membro, bucket, qtd in cursor.fetchall():
+        entry = members.setdefault(membro_id, (membro_id, membro, [0.0] * buckets))
+        entry[2][min(bucket, buckets - 1)] += qtd
+
+    return sorted(members.values(), key=lambda entry: sum(entry[2]), reverse=True)
+
+def get_farm_history(conn: sqlite3.Connection, guild_id: int, week_keys):
+    placeholders = ", ".join("?" for _ in week_keys)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT membro_id, MAX(membro), SUM(pedra), SUM(semente), SUM(total), COUNT(*)
+        FROM farm_rollups
+        WHERE guild_id = ? AND week_key IN ({placeholders})
+        GROUP BY membro_id
+    """, (guild_id, *week_keys))
+    rows = {row[0]: [*row, 0] for row in cursor.fetchall()}
+
+    cursor.execute(f"""
+        SELECT user_id, MAX(user_name), SUM(confirmados)
+        FROM pvp_rollups
+        WHERE guild_id = ? AND week_key IN ({placeholders})
+        GROUP BY user_id
+    """, (guild_id, *week_keys))
+    for user_id, user_name, confirmados in cursor.fetchall():
+        row = rows.setdefault(user_id, [user_id, user_name, 0, 0, 0, 0, 0])
+        row[6] = confirmados
+
+    return sorted(rows.values(), key=lambda row: (row[4], row[6]), reverse=True)
+
+def get_member_history(conn: sqlite3.Connection, guild_id: int, membro_id: int, week_keys):
+    placeholders = ", ".join("?" for _ in week_keys)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT week_key, pedra, semente, total
+        FROM farm_rollups
+        WHERE guild_id = ? AND week_key IN ({placeholders}) AND membro_id = ?
+    """, (guild_id, *week_keys, membro_id))
+    farms = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    cursor.execute(f"""
+        SELECT week_key, confirmados
+        FROM pvp_rollups
+        WHERE guild_id = ? AND week_key IN ({placeholders}) AND user_id = ?
+    """, (guild_id, *week_keys, membro_id))
+    pvp = dict(cursor.fetchall())
+
+    return [(week_key, *farms.get(week_key, (0, 0, 0)), pvp.get(week_key, 0)) for week_key in week_keys]
+
+@journaled
+def close_week(conn: sqlite3.Connection, guild_id: int, week_key: str, closed_by_id: int, closed_by_name: str):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT OR IGNORE INTO weekly_closings (guild_id, week_key, closed_by_id, closed_by_name, closed_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (guild_id, week_key, closed_by_id, closed_by_name, get_timestamp()))
+    if cursor.rowcount == 0:
+        return False
+
+    cursor.execute("""
+        INSERT INTO weekly_snapshots (guild_id, week_key, membro_id, membro, pedra, semente, total, pvp_confirmados)
+        SELECT fr.guild_id, fr.week_key, fr.membro_id, fr.membro, fr.pedra, fr.semente, fr.total, COALESCE(pr.confirmados, 0)
+        FROM farm_rollups fr
+        LEFT JOIN pvp_rollups pr
+            ON pr.guild_id = fr.guild_id AND pr.week_key = fr.week_key AND pr.user_id = fr.membro_id
+        WHERE fr.guild_id = ? AND fr.week_key = ?
+    """, (guild_id, week_key))
+
+    cursor.execute("""
+        INSERT INTO weekly_snapshots (guild_id, week_key, membro_id, membro, pedra, semente, total, pvp_confirmados)
+        SELECT pr.guild_id, pr.week_key, pr.user_id, pr.user_name, 0, 0, 0, pr.confirmados
+        FROM pvp_rollups pr
+        WHERE pr.guild_id = ? AND pr.week_key = ?
+          AND NOT EXISTS (
+              SELECT 1 FROM farm_rollups fr
+              WHERE fr.guild_id = pr.guild_id AND fr.week_key = pr.week_key AND fr.membro_id = pr.user_id
+          )
+    """, (guild_id, week_key))
+
+    return True
+
+def is_week_published(conn: sqlite3.Connection, guild_id: int, week_key: str):
+    cursor = conn.cursor()
+    cursor.execute("SELECT published_at FROM weekly_closings WHERE guild_id = ? AND week_key = ?", (guild_id, week_key))
+    row = cursor.fetchone()
+    return row is not None and row[0] is not None
+
+@journaled
+def mark_week_published(conn: sqlite3.Connection, guild_id: int, week_key: str):
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE weekly_closings SET published_at = ?
+        WHERE guild_id = ? AND week_key = ? AND published_at IS NULL
+    """, (get_timestamp(), guild_id, week_key))
+    return cursor.rowcount > 0
+
+@contextlib.contextmanager
+def archive_transaction(conn: sqlite3.Connection):
+    # No replay do diário as linhas já estão no arquivo; só é preciso removê-las do banco principal.
+    if getattr(journal_replay, "active", False):
+        yield
+        return
+
+    conn.commit()
+    conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DB_FILE,))
+    try:
+        conn.execute("BEGIN")
+        yield
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE archive")
+
+def copy_to_archive(cursor: sqlite3.Cursor, table: str, where: str, params):
+    if getattr(journal_replay, "active", False):
+        cursor.execute(f"DELETE FROM main.{table} WHERE {where}", params)
+        return cursor.rowcount
+
+    cursor.execute(f"PRAGMA main.table_info({table})")
+    columns = [row[1] for row in cursor.fetchall()]
+
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} AS SELECT * FROM main.{table} WHERE 0")
+    cursor.execute(f"PRAGMA archive.table_info({table})")
+    archived_columns = {row[1] for row in cursor.fetchall()}
+    for column in columns:
+        if column not in archived_columns:
+            cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column}")
+
+    column_list = ", ".join(columns)
+    cursor.execute(f"""
+        INSERT INTO archive.{table} ({column_list})
+        SELECT {column_list} FROM main.{table} WHERE {where}
+    """, params)
+    cursor.execute(f"DELETE FROM main.{table} WHERE {where}", params)
+    return cursor.rowcount
+
+@journaled
+def archive_old_weeks(conn: sqlite3.Connection, retention_weeks: int):
+    cutoff = datetime.fromtimestamp(get_timestamp(), timezone.utc) - timedelta(weeks=retention_weeks)
+    cursor = conn.cursor()
+    cursor.execute("SELECT guild_id, week_key FROM weekly_closings WHERE archived_at IS NULL")
+    weeks = [(guild_id, week_key) for guild_id, week_key in cursor.fetchall() if get_week_start(week_key) < cutoff]
+    if not weeks:
+        return 0
+
+    with archive_transaction(conn):
+        values = ", ".join("(?, ?)" for _ in weeks)
+        params = [value for week in weeks for value in week]
+        moved = copy_to_archive(cursor, "farms", f"(guild_id, week_key) IN (VALUES {values})", params)
+        moved += copy_to_archive(
+            cursor,
+            "pvp_confirmations",
+            f"message_id IN (SELECT message_id FROM main.pvp_events WHERE (guild_id, week_key) IN (VALUES {values}))",
+            params
+        )
+        moved += copy_to_archive(cursor, "pvp_events", f"(guild_id, week_key) IN (VALUES {values})", params)
+        cursor.execute(
+            f"UPDATE weekly_closings SET archived_at = ? WHERE (guild_id, week_key) IN (VALUES {values})",
+            (get_timestamp(), *params)
+        )
+
+    return moved
+
+EXPORT_TABLES = {
+    "farms": (
+        ["id", "week_key", "membro_id", "membro", "farm_tipo", "qtd", "admin_id", "admin_name", "created_at"],
+        "guild_id = ? AND week_key IN ({weeks})"
+    ),
+    "pvp_events": (
+        ["message_id", "channel_id", "week_key", "title", "description", "created_by_id", "created_by_name", "created_at"],
+        "guild_id = ? AND week_key IN ({weeks})"
+    ),
+    "pvp_confirmations": (
+        ["message_id", "user_id", "user_name", "status", "updated_at"],
+        "message_id IN ({events})"
+    ),
+}
+EXPORT_TIMESTAMP_COLUMNS = {"created_at", "updated_at"}
+
+def export_column(column: str, existing):
+    if column not in existing:
+        return f"NULL AS {column}"
+    if column in EXPORT_TIMESTAMP_COLUMNS:
+        # Linhas arquivadas antes da v9 ainda guardam a data como texto.
+        return (
+            f"CASE WHEN {column} GLOB '*/*' THEN {column} "
+            f"ELSE strftime('%Y-%m-%d %H:%M:%S', {column}, 'unixepoch') END AS {column}"
+        )
+    return column
+
+def build_export_query(conn: sqlite3.Connection, schemas, table: str, guild_id: int, week_keys):
+    columns, where = EXPORT_TABLES[table]
+    weeks = ", ".join("?" for _ in week_keys)
+
+    # Confirmações podem estar num banco e o evento no outro (eventos encerrados são podados antes da semana ser arquivada).
+    event_schemas = [
+        schema for schema in schemas
+        if conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = 'pvp_events'").fetchone()
+    ]
+    events = " UNION ALL ".join(
+        f"SELECT message_id FROM {schema}.pvp_events WHERE guild_id = ? AND week_key IN ({weeks})"
+        for schema in event_schemas
+    )
+
+    selects = []
+    params = []
+    for schema in schemas:
+        existing = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+        if not existing:
+            continue
+
+        column_list = ", ".join(export_column(column, existing) for column in columns)
+        if "{events}" in where:
+            if not event_schemas:
+                continue
+            selects.append(f"SELECT {column_list} FROM {schema}.{table} WHERE {where.format(events=events)}")
+            params.extend((guild_id, *week_keys) * len(event_schemas))
+        else:
+            selects.append(f"SELECT {column_list} FROM {schema}.{table} WHERE {where.format(weeks=weeks)}")
+            params.extend((guild_id, *week_keys))
+
+    return " UNION ALL ".join(selects), params
+
+def write_export_table(output: zipfile.ZipFile, table: str, batches):
+    columns, _ = EXPORT_TABLES[table]
+    count = 0
+    with output.open(f"{table}.csv", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as text:
+        writer = csv.writer(text, delimiter=";")
+        writer.writerow(columns)
+        for rows in batches:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+def export_csv_zip(db_path: str, archive_path: str, guild_id: int, week_keys, output_path: str):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        schemas = ["main"]
+        if os.path.exists(archive_path):
+            conn.execute("ATTACH DATABASE ? AS archive", (f"file:{archive_path}?mode=ro",))
+            schemas.append("archive")
+
+        counts = {}
+        with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as output:
+            for table in EXPORT_TABLES:
+                query, params = build_export_query(conn, schemas, table, guild_id, week_keys)
+                batches = []
+                if query:
+                    cursor = conn.execute(query, params)
+                    batches = iter(functools.partial(cursor.fetchmany, 1000), [])
+                counts[table] = write_export_table(output, table, batches)
+
+        return counts
+    finally:
+        conn.close()
+
+def count_rollup_differences(before: dict, after: dict):
+    differences = 0
+    for key in before.keys() | after.keys():
+        old = before.get(key)
+        new = after.get(key)
+        if old is None or new is None or any(abs(a - b) > 1e-6 for a, b in zip(old, new)):
+            differences += 1
+    return differences
+
+class Storage(ABC):
+    cache = None
+
+    @abstractmethod
+    async def add_farm(self, guild_id: int, membro_id: int, membro: str, farm_tipo: str, qtd: float, admin_id: int, admin_name: str):
+        ...
+
+    @abstractmethod
+    async def add_farms_bulk(self, guild_id: int, rows, admin_id: int, admin_name: str):
+        ...
+
+    @abstractmethod
+    async def get_farm_breakdown(self, guild_id: int, limit=10):
+        ...
+
+    @abstractmethod
+    async def get_week_ranking(self, guild_id: int, week_key: str, limit=10):
+        ...
+
+    @abstractmethod
+    async def get_farm_history(self, guild_id: int, week_keys):
+        ...
+
+    @abstractmethod
+    async def get_member_history(self, guild_id: int, membro_id: int, week_keys):
+        ...
+
+    @abstractmethod
+    async def get_farm_rate(self, guild_id: int, since: int, bucket_seconds: int, buckets: int):
+        ...
+
+    @abstractmethod
+    async def rebuild_rollups(self, guild_id: int):
+        ...
+
+    @abstractmethod
+    async def close_week(self, guild_id: int, week_key: str, closed_by_id: int, closed_by_name: str):
+        ...
+
+    @abstractmethod
+    async def is_week_published(self, guild_id: int, week_key: str):
+        ...
+
+    @abstractmethod
+    async def mark_week_published(self, guild_id: int, week_key: str):
+        ...
+
+    @abstractmethod
+    async def archive_old_weeks(self, retention_weeks: int):
+        ...
+
+    @abstractmethod
+    async def get_state(self, key: str):
+        ...
+
+    @abstractmethod
+    async def set_state(self, key: str, value: str):
+        ...
+
+    @abstractmethod
+    async def export_csv_zip(self, guild_id: int, week_keys, output_path: str):
+        ...
+
+    @abstractmethod
+    async def save_pvp_event(self, guild_id: int, message_id: int, channel_id: int, title: str, description: str, created_by_id: int, created_by_name: str, starts_at: int = None):
+        ...
+
+    @abstractmethod
+    async def load_pvp_event(self, message_id: int):
+        ...
+
+    @abstractmethod
+    async def close_pvp_event(self, message_id: int, guild_id: int = None):
+        ...
+
+    @abstractmethod
+    async def get_due_pvp_events(self, now: int):
+        ...
+
+    @abstractmethod
+    async def prune_closed_pvp_events(self, closed_before: int):
+        ...
+
+    @abstractmethod
+    async def upsert_confirmation(self, guild_id: int, message_id: int, user_id: int, user_name: str, status: str):
+        ...
+
+    @abstractmethod
+    async def delete_confirmation(self, message_id: int, user_id: int):
+        ...
+
+    @abstractmethod
+    async def remove_member_from_event(self, guild_id: int, message_id: int, user_id: int):
+        ...
+
+    @abstractmethod
+    async def get_top_pvp(self, guild_id: int, limit=10):
+        ...
+
+class SQLiteStorage(Storage):
+    def __init__(self, db: Database):
+        self.db = db
+        self.cache = pvp_cache
+
+    async def add_farm(self, guild_id: int, membro_id: int, membro: str, farm_tipo: str, qtd: float, admin_id: int, admin_name: str):
+        return await self.db.run(add_farm, guild_id, membro_id, membro, farm_tipo, qtd, admin_id, admin_name)
+
+    async def add_farms_bulk(self, guild_id: int, rows, admin_id: int, admin_name: str):
+        return await self.db.run(add_farms_bulk, guild_id, rows, admin_id, admin_name)
+
+    async def get_farm_breakdown(self, guild_id: int, limit=10):
+        return await self.db.run(get_farm_breakdown, guild_id, limit=limit)
+
+    async def get_week_ranking(self, guild_id: int, week_key: str, limit=10):
+        return await self.db.run(get_week_ranking, guild_id, week_key, limit)
+
+    async def get_farm_history(self, guild_id: int, week_keys):
+        return await self.db.run(get_farm_history, guild_id, week_keys)
+
+    async def get_member_history(self, guild_id: int, membro_id: int, week_keys):
+        return await self.db.run(get_member_history, guild_id, membro_id, week_keys)
+
+    async def get_farm_rate(self, guild_id: int, since: int, bucket_seconds: int, buckets: int):
+        return await self.db.run(get_farm_rate, guild_id, since, bucket_seconds, buckets)
+
+    async def rebuild_rollups(self, guild_id: int):
+        return await self.db.run(rebuild_rollups, guild_id)
+
+    async def close_week(self, guild_id: int, week_key: str, closed_by_id: int, closed_by_name: str):
+        return await self.db.run(close_week, guild_id, week_key, closed_by_id, closed_by_name)
+
+    async def is_week_published(self, guild_id: int, week_key: str):
+        return await self.db.run(is_week_published, guild_id, week_key)
+
+    async def mark_week_published(self, guild_id: int, week_key: str):
+        return await self.db.run(mark_week_published, guild_id, week_key)
+
+    async def archive_old_weeks(self, retention_weeks: int):
+        return await self.db.run(archive_old_weeks, retention_weeks)
+
+    async def get_state(self, key: str):
+        return await self.db.run(get_state, key)
+
+    async def set_state(self, key: str, value: str):
+        return await self.db.run(set_state, key, value)
+
+    async def export_csv_zip(self, guild_id: int, week_keys, output_path: str):
+        # Lê por uma conexão própria, somente leitura, para não ocupar a thread do banco.
+        return await asyncio.to_thread(export_csv_zip, self.db.path, ARCHIVE_DB_FILE, guild_id, week_keys, output_path)
+
+    async def save_pvp_event(self, guild_id: int, message_id: int, channel_id: int, title: str, description: str, created_by_id: int, created_by_name: str, starts_at: int = None):
+        return await self.db.run(save_pvp_event, guild_id, message_id, channel_id, title, description, created_by_id, created_by_name, starts_at)
+
+    async def load_pvp_event(self, message_id: int):
+        return await self.db.run(load_pvp_event, message_id)
+
+    async def close_pvp_event(self, message_id: int, guild_id: int = None):
+        return await self.db.run(close_pvp_event, message_id, guild_id)
+
+    async def get_due_pvp_events(self, now: int):
+        return await self.db.run(get_due_pvp_events, now)
+
+    async def prune_closed_pvp_events(self, closed_before: int):
+        return await self.db.run(prune_closed_pvp_events, closed_before)
+
+    async def upsert_confirmation(self, guild_id: int, message_id: int, user_id: int, user_name: str, status: str):
+        return await self.db.run(upsert_confirmation, guild_id, message_id, user_id, user_name, status)
+
+    async def delete_confirmation(self, message_id: int, user_id: int):
+        return await self.db.run(delete_confirmation, message_id, user_id)
+
+    async def remove_member_from_event(self, guild_id: int, message_id: int, user_id: int):
+        return await self.db.run(remove_member_from_event, guild_id, message_id, user_id)
+
+    async def get_top_pvp(self, guild_id: int, limit=10):
+        return await self.db.run(get_top_pvp, guild_id, limit=limit)
+
+class MemoryStorage(Storage):
+    def __init__(self, cache: PVPEventCache = None):
+        self.cache = cache or PVPEventCache(PVP_CACHE_SIZE, PVP_CACHE_MAX_AGE)
+        self.farms = []
+        self.farm_weeks = {}
+        self.pvp_weeks = {}
+        self.events = {}
+        self.confirmations = defaultdict(dict)
+        self.closings = {}
+        self.snapshots = {}
+        self.state = {}
+        # O equivalente ao banco de arquivo: linhas movidas por archive_old_weeks e prune_closed_pvp_events.
+        self.archived_farms = []
+        self.archived_events = []
+        self.archived_confirmations = []
+
+    def leaderboard(self, boards: dict, guild_id: int, week_key: str, drop_empty: bool = False):
+        board = boards.get((guild_id, week_key))
+        if board is None:
+            board = boards[guild_id, week_key] = WeeklyLeaderboard(drop_empty=drop_empty)
+            board.load(week_key, [])
+        return board
+
+    async def add_farm(self, guild_id: int, membro_id: int, membro: str, farm_tipo: str, qtd: float, admin_id: int, admin_name: str):
+        await self.add_farms_bulk(guild_id, [(membro_id, membro, farm_tipo, qtd)], admin_id, admin_name)
+
+    async def add_farms_bulk(self, guild_id: int, rows, admin_id: int, admin_name: str):
+        week_key = get_week_key()
+        created_at = get_timestamp()
+        board = self.leaderboard(self.farm_weeks, guild_id, week_key)
+
+        totals = {}
+        for membro_id, membro, farm_tipo, qtd in rows:
+            farm_id = len(self.farms) + len(self.archived_farms) + 1
+            self.farms.append((farm_id, guild_id, week_key, membro_id, membro, farm_tipo, qtd, admin_id, admin_name, created_at))
+            deltas = (qtd, 0, qtd) if farm_tipo == "Pedra" else (0, qtd, qtd)
+            board.add(week_key, membro_id, membro, deltas)
+
+            values = totals.setdefault(membro_id, [0, 0, 0])
+            for i, delta in enumerate(deltas):
+                values[i] += delta
+        return totals
+
+    async def get_farm_breakdown(self, guild_id: int, limit=10):
+        return await self.get_week_ranking(guild_id, get_week_key(), limit)
+
+    async def get_week_ranking(self, guild_id: int, week_key: str, limit=10):
+        board = self.farm_weeks.get((guild_id, week_key))
+        return board.top(limit) if board is not None else []
+
+    async def get_farm_history(self, guild_id: int, week_keys):
+        rows = {}
+        for week_key in week_keys:
+            board = self.farm_weeks.get((guild_id, week_key))
+            if board is None:
+                continue
+            for membro_id, (pedra, semente, total) in sorted(board.entries.items()):
+                row = rows.setdefault(membro_id, [membro_id, board.labels[membro_id], 0, 0, 0, 0, 0])
+                row[1] = max(row[1], board.labels[membro_id])
+                row[2] += pedra
+                row[3] += semente
+                row[4] += total
+                row[5] += 1
+
+        pvp = {}
+        for week_key in week_keys:
+            board = self.pvp_weeks.get((guild_id, week_key))
+            if board is None:
+                continue
+            for user_id, (confirmados,) in sorted(board.entries.items()):
+                user_name, total = pvp.get(user_id, (board.labels[user_id], 0))
+                pvp[user_id] = (max(user_name, board.labels[user_id]), total + confirmados)
+        for user_id, (user_name, confirmados) in sorted(pvp.items()):
+            row = rows.setdefault(user_id, [user_id, user_name, 0, 0, 0, 0, 0])
+            row[6] = confirmados
+
+        return sorted(rows.values(), key=lambda row: (row[4], row[6]), reverse=True)
+
+    async def get_member_history(self, guild_id: int, membro_id: int, week_keys):
+        history = []
+        for week_key in week_keys:
+            farm = self.farm_weeks.get((guild_id, week_key))
+            pvp = self.pvp_weeks.get((guild_id, week_key))
+            farms = farm.entries.get(membro_id, (0, 0, 0)) if farm is not None else (0, 0, 0)
+            confirmados = pvp.entries.get(membro_id, (0,))[0] if pvp is not None else 0
+            history.append((week_key, *farms, confirmados))
+        return history
+
+    async def get_farm_rate(self, guild_id: int, since: int, bucket_seconds: int, buckets: int):
+        groups = {}
+        for _, farm_guild_id, _, membro_id, membro, _, qtd, _, _, created_at in self.farms:
+            if farm_guild_id != guild_id or created_at < since:
+                continue
+            key = (membro_id, (created_at - since) // bucket_seconds)
+            name, total = groups.get(key, (membro, 0.0))
+            groups[key] = (max(name, membro), total + qtd)
+
+        members = {}
+        for (membro_id, bucket), (membro, qtd) in sorted(groups.items()):
+            entry = members.setdefault(membro_id, (membro_id, membro, [0.0] * buckets))
+            entry[2][min(bucket, buckets - 1)] += qtd
+
+        return sorted(members.values(), key=lambda entry: sum(entry[2]), reverse=True)
+
+    def rollup_values(self, boards: dict, guild_id: int):
+        return {
+            (board_guild_id, week_key, key): tuple(values)
+            for (board_guild_id, week_key), board in boards.items() if board_guild_id == guild_id
+            for key, values in board.entries.items()
+        }
+
+    async def rebuild_rollups(self, guild_id: int):
+        farms_before = self.rollup_values(self.farm_weeks, guild_id)
+        pvp_before = self.rollup_values(self.pvp_weeks, guild_id)
+
+        # Semanas arquivadas não têm mais registros brutos; seus rollups alimentam o /historico.
+        archived = {key for key, closing in self.closings.items() if closing["archived_at"] is not None}
+        for boards in (self.farm_weeks, self.pvp_weeks):
+            for key in [key for key in boards if key[0] == guild_id and key not in archived]:
+                del boards[key]
+
+        for _, farm_guild_id, week_key, membro_id, membro, farm_tipo, qtd, _, _, _ in self.farms:
+            if farm_guild_id != guild_id or (farm_guild_id, week_key) in archived:
+                continue
+            deltas = (qtd, 0, qtd) if farm_tipo == "Pedra" else (0, qtd, qtd)
+            self.leaderboard(self.farm_weeks, guild_id, week_key).add(week_key, membro_id, membro, deltas)
+
+        for message_id, event in sorted(self.events.items()):
+            if event["guild_id"] != guild_id or (guild_id, event["week_key"]) in archived:
+                continue
+            if event["roster"] is not None:
+                confirmados = json.loads(event["roster"])["confirmados"]
+            else:
+                confirmados = [
+                    (user_id, user_name)
+                    for user_id, (_, user_name, status, _) in self.confirmations[message_id].items()
+                    if status == "confirmado"
+                ]
+            board = self.leaderboard(self.pvp_weeks, guild_id, event["week_key"], drop_empty=True)
+            for user_id, user_name in confirmados:
+                board.add(event["week_key"], user_id, user_name, (1,))
+
+        return (
+            count_rollup_differences(farms_before, self.rollup_values(self.farm_weeks, guild_id)),
+            count_rollup_differences(pvp_before, self.rollup_values(self.pvp_weeks, guild_id)),
+        )
+
+    async def close_week(self, guild_id: int, week_key: str, closed_by_id: int, closed_by_name: str):
+        key = (guild_id, week_key)
+        if key in self.closings:
+            return False
+
+        self.closings[key] = {
+            "closed_by_id": closed_by_id,
+            "closed_by_name": closed_by_name,
+            "closed_at": get_timestamp(),
+            "archived_at": None,
+            "published_at": None,
+        }
+        farm = self.farm_weeks.get(key)
+        pvp = self.pvp_weeks.get(key)
+        farm_entries = farm.entries if farm is not None else {}
+        pvp_entries = pvp.entries if pvp is not None else {}
+
+        snapshot = [
+            (membro_id, farm.labels[membro_id], *values, pvp_entries.get(membro_id, (0,))[0])
+            for membro_id, values in farm_entries.items()
+        ]
+        snapshot += [
+            (user_id, pvp.labels[user_id], 0, 0, 0, confirmados)
+            for user_id, (confirmados,) in pvp_entries.items() if user_id not in farm_entries
+        ]
+        self.snapshots[key] = snapshot
+        return True
+
+    async def is_week_published(self, guild_id: int, week_key: str):
+        closing = self.closings.get((guild_id, week_key))
+        return closing is not None and closing["published_at"] is not None
+
+    async def mark_week_published(self, guild_id: int, week_key: str):
+        closing = self.closings.get((guild_id, week_key))
+        if closing is None or closing["published_at"] is not None:
+            return False
+        closing["published_at"] = get_timestamp()
+        return True
+
+    def archive_confirmations(self, message_ids):
+        moved = 0
+        for message_id in message_ids:
+            confirmations = self.confirmations.pop(message_id, {})
+            for user_id, (_, user_name, status, updated_at) in confirmations.items():
+                self.archived_confirmations.append((message_id, user_id, user_name, status, updated_at))
+            moved += len(confirmations)
+        return moved
+
+    async def archive_old_weeks(self, retention_weeks: int):
+        cutoff = datetime.fromtimestamp(get_timestamp(), timezone.utc) - timedelta(weeks=retention_weeks)
+        weeks = {
+            key for key, closing in self.closings.items()
+            if closing["archived_at"] is None and get_week_start(key[1]) < cutoff
+        }
+        if not weeks:
+            return 0
+
+        kept = []
+        for row in self.farms:
+            (self.archived_farms if (row[1], row[2]) in weeks else kept).append(row)
+        moved = len(self.farms) - len(kept)
+        self.farms = kept
+
+        message_ids = [
+            message_id for message_id, event in self.events.items()
+            if (event["guild_id"], event["week_key"]) in weeks
+        ]
+        moved += self.archive_confirmations(message_ids)
+        for message_id in message_ids:
+            self.archived_events.append((message_id, self.events.pop(message_id)))
+        moved += len(message_ids)
+
+        for key in weeks:
+            self.closings[key]["archived_at"] = get_timestamp()
+        return moved
+
+    async def get_state(self, key: str):
+        return self.state.get(key)
+
+    async def set_state(self, key: str, value: str):
+        self.state[key] = value
+
+    async def export_csv_zip(self, guild_id: int, week_keys, output_path: str):
+        weeks = set(week_keys)
+
+        def timestamp(value):
+            return datetime.fromtimestamp(value, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+        farms = [
+            (farm_id, week_key, membro_id, membro, farm_tipo, qtd, admin_id, admin_name, timestamp(created_at))
+            for farm_id, farm_guild_id, week_key, membro_id, membro, farm_tipo, qtd, admin_id, admin_name, created_at
+            in self.archived_farms + self.farms
+            if farm_guild_id == guild_id and week_key in weeks
+        ]
+        # Um evento arquivado pode ter sido salvo de novo no banco principal; o SQLite exporta as duas linhas.
+        events = [
+            (message_id, event)
+            for message_id, event in (*self.archived_events, *self.events.items())
+            if event["guild_id"] == guild_id and event["week_key"] in weeks
+        ]
+        message_ids = {message_id for message_id, _ in events}
+        confirmations = [row for row in self.archived_confirmations if row[0] in message_ids]
+        confirmations += [
+            (message_id, user_id, user_name, status, updated_at)
+            for message_id in message_ids
+            for user_id, (_, user_name, status, updated_at) in self.confirmations.get(message_id, {}).items()
+        ]
+
+        tables = {
+            "farms": farms,
+            "pvp_events": [
+                (
+                    message_id,
+                    event["channel_id"],
+                    event["week_key"],
+                    event["title"],
+                    event["description"],
+                    event["created_by_id"],
+                    event["created_by_name"],
+                    timestamp(event["created_at"])
+                )
+                for message_id, event in events
+            ],
+            "pvp_confirmations": [(*row[:4], timestamp(row[4])) for row in confirmations],
+        }
+        with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as output:
+            return {table: write_export_table(output, table, [rows]) for table, rows in tables.items()}
+
+    def update_pvp_rollup(self, message_id: int, user_id: int, user_name: str, delta: int):
+        event = self.events.get(message_id)
+        if event is None:
+            return
+        board = self.leaderboard(self.pvp_weeks, event["guild_id"], event["week_key"], drop_empty=True)
+        board.add(event["week_key"], user_id, user_name, (delta,))
+
+    def update_event_rollups(self, message_id: int, delta: int):
+        for user_id, (_, user_name, status, _) in self.confirmations[message_id].items():
+            if status == "confirmado":
+                self.update_pvp_rollup(message_id, user_id, user_name, delta)
+
+    def is_closed(self, message_id: int):
+        event = self.events.get(message_id)
+        return event is not None and event["closed_at"] is not None
+
+
+    async def save_pvp_event(self, guild_id: int, message_id: int, channel_id: int, title: str, description: str, created_by_id: int, created_by_name: str, starts_at: int = None):
+        self.update_event_rollups(message_id, -1)
+        self.events[message_id] = {
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "title": title,
+            "description": description,
+            "created_by_id": created_by_id,
+            "created_by_name": created_by_name,
+            "created_at": get_timestamp(),
+            "week_key": get_week_key(),
+            "starts_at": starts_at,
+            "closed_at": None,
+            "roster": None,
+        }
+        self.update_event_rollups(message_id, 1)
+        return await self.load_pvp_event(message_id)
+
+    async def load_pvp_event(self, message_id: int):
+        row = self.events.get(message_id)
+        if row is None:
+            return None
+
+        event = PVPEventState(
+            row["guild_id"],
+            message_id,
+            row["channel_id"],
+            row["title"],
+            row["description"],
+            row["created_by_name"],
+            row["week_key"],
+            row["starts_at"],
+            row["closed_at"]
+        )
+        if row["roster"] is not None:
+            event.load_roster(row["roster"])
+        else:
+            for user_id, (_, user_name, status, _) in self.confirmations[message_id].items():
+                event.set_status(user_id, user_name, status)
+
+        self.cache.put(event)
+        return event
+
+    async def close_pvp_event(self, message_id: int, guild_id: int = None):
+        event = await self.load_pvp_event(message_id)
+        if event is None or event.closed_at is not None:
+            return None
+        if guild_id is not None and event.guild_id != guild_id:
+            return None
+
+        event.closed_at = get_timestamp()
+        self.events[message_id]["closed_at"] = event.closed_at
+        self.events[message_id]["roster"] = event.roster_json()
+        return event
+
+    async def get_due_pvp_events(self, now: int):
+        started_before = now - int(PVP_EVENT_DURATION.total_seconds())
+        created_before = now - int(PVP_EVENT_MAX_OPEN.total_seconds())
+        return [
+            (message_id, event["channel_id"])
+            for message_id, event in self.events.items()
+            if event["closed_at"] is None and (
+                event["starts_at"] <= started_before if event["starts_at"] is not None
+                else event["created_at"] <= created_before
+            )
+        ]
+
+    async def prune_closed_pvp_events(self, closed_before: int):
+        return self.archive_confirmations([
+            message_id for message_id, event in self.events.items()
+            if event["closed_at"] is not None and event["closed_at"] <= closed_before
+        ])
+
+    async def upsert_confirmation(self, guild_id: int, message_id: int, user_id: int, user_name: str, status: str):
+        if self.is_closed(message_id):
+            return False
+
+        confirmations = self.confirmations[message_id]
+        previous = confirmations.get(user_id)
+        confirmations[user_id] = (previous[0] if previous else guild_id, user_name, status, get_timestamp())
+
+        if previous is not None and previous[2] == "confirmado":
+            self.update_pvp_rollup(message_id, user_id, previous[1], -1)
+        if status == "confirmado":
+            self.update_pvp_rollup(message_id, user_id, user_name, 1)
+
+        self.cache.set_status(message_id, user_id, user_name, status)
+        return True
+
+    async def delete_confirmation(self, message_id: int, user_id: int):
+        if self.is_closed(message_id):
+            return False
+
+        previous = self.confirmations[message_id].pop(user_id, None)
+        if previous is not None and previous[2] == "confirmado":
+            self.update_pvp_rollup(message_id, user_id, previous[1], -1)
+
+        self.cache.set_status(message_id, user_id, None, None)
+        return True
+
+    async def remove_member_from_event(self, guild_id: int, message_id: int, user_id: int):
+        if self.is_closed(message_id):
+            return None
+
+        confirmations = self.confirmations[message_id]
+        previous = confirmations.get(user_id)
+        if previous is None or previous[0] != guild_id:
+            return 0
+
+        del confirmations[user_id]
+        if previous[2] == "confirmado":
+            self.update_pvp_rollup(message_id, user_id, previous[1], -1)
+        self.cache.set_status(message_id, user_id, None, None)
+        return 1
+
+    async def get_top_pvp(self, guild_id: int, limit=10):
+        board = self.pvp_weeks.get((guild_id, get_week_key()))
+        return board.top(limit) if board is not None else []
+
+storage = SQLiteStorage(db)
+
+def parse_event_start(value: str, now: datetime = None):
+    value = value.strip()
+    now = now or datetime.now(EVENT_TIMEZONE)
+    try:
+        return int(datetime.strptime(value, "%d/%m/%Y %H:%M").replace(tzinfo=EVENT_TIMEZONE).timestamp())
+    except ValueError:
+        pass
+
+    # Sem ano, vale a próxima ocorrência da data (02/01 digitado em dezembro é janeiro do ano seguinte);
+    # um horário que já passou hoje continua hoje e é recusado pelo comando.
+    for year in (now.year, now.year + 1):
+        try:
+            moment = datetime.strptime(f"{value} {year}", "%d/%m %H:%M %Y").replace(tzinfo=EVENT_TIMEZONE)
+        except ValueError:
+            continue
+        if moment.date() >= now.date():
+            return int(moment.timestamp())
+    raise ValueError(f"Horário inválido: {value}")
+
+PVP_ROSTER_LABELS = {
+    "confirmado": ("✅ Confirmados", "Ninguém confirmou ainda."),
+    "recusado": ("❌ Não vão", "Ninguém recusou ainda."),
+}
+
+def build_pvp_embed(event: PVPEventState):
+
+    embed = discord.Embed(
+        title=f"🔒 {event.title}" if event.closed_at is not None else event.title,
+        description=event.description,
+        color=0x95A5A6 if event.closed_at is not None else 0xFF4444
+    )
+
+    if event.starts_at is not None:
+        embed.add_field(name="🕒 Início", value=f"<t:{event.starts_at}:F> (<t:{event.starts_at}:R>)", inline=False)
+
+    for status, (label, empty) in PVP_ROSTER_LABELS.items():
+        text, _, page_count, total, shown = storage.cache.page(event, status, 0)
+        if page_count > 1:
+            text += f"\n… e mais {total - shown}. Use 📋 Ver lista."
+        embed.add_field(name=f"{label} ({total})", value=text or empty, inline=True)
+
+    if event.closed_at is not None:
+        embed.add_field(
+            name="Evento encerrado",
+            value=f"Encerrado <t:{event.closed_at}:R>. A lista acima é a final.",
+            inline=False
+        )
+    else:
+        embed.add_field(
+            name="Como responder",
+            value="Use os botões abaixo para confirmar, recusar ou remover sua resposta.",
+            inline=False
+        )
+
+    embed.set_footer(text=f"Criado por {event.created_by_name}")
+    return embed
+
+class PVPRenderScheduler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.locks = weakref.WeakValueDictionary()
+        self.pending = {}
+        self.tasks = {}
+        self.last_edit = {}
+        self.burst_clicks = {}
+        self.requested = 0
+        self.edits = 0
+        self.failures = 0
+        self.missing = 0
+
+    def lock(self, message_id: int) -> asyncio.Lock:
+        lock = self.locks.get(message_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.locks[message_id] = lock
+        return lock
+
+    def schedule(self, message: discord.Message):
+        self.requested += 1
+        self.burst_clicks[message.id] = self.burst_clicks.get(message.id, 0) + 1
+        self.pending[message.id] = message
+        if message.id not in self.tasks:
+            self.tasks[message.id] = asyncio.create_task(self._render(message.id))
+
+    def _forget_edit(self, message_id: int, edited_at: float):
+        # Uma tarefa mais nova pode ter editado depois; o horário dela continua valendo.
+        if edited_at is not None and self.last_edit.get(message_id) == edited_at:
+            self.last_edit.pop(message_id, None)
+
+    @property
+    def saved(self) -> int:
+        return self.requested - self.edits - self.failures - self.missing - len(self.pending)
+
+    async def _render(self, message_id: int):
+        loop = asyncio.get_running_loop()
+        edits = 0
+        try:
+            while message_id in self.pending:
+                wait = self.last_edit.get(message_id, 0) + self.interval - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                message = self.pending.pop(message_id)
+                event = storage.cache.get(message_id)
+                if event is None:
+                    event = await storage.load_pvp_event(message_id)
+                if event is None:
+                    self.missing += 1
+                    print(f"Evento PVP {message_id} não encontrado no banco.")
+                    continue
+
+                try:
+                    await message.edit(embed=build_pvp_embed(event), view=PVPEventView(closed=event.closed_at is not None))
+                    self.edits += 1
+                    edits += 1
+                except discord.HTTPException as e:
+                    self.failures += 1
+                    print(f"Erro ao atualizar evento PVP {message_id}: {e}")
+
+                self.last_edit[message_id] = loop.time()
+        finally:
+            del self.tasks[message_id]
+            edited_at = self.last_edit.get(message_id)
+            if edited_at is not None:
+                loop.call_later(self.interval, self._forget_edit, message_id, edited_at)
+
+            clicks = self.burst_clicks.pop(message_id, 0)
+            if edits and clicks > edits:
+                print(f"Evento PVP {message_id}: {clicks} atualizações agrupadas em {edits} edições.")
+
+pvp_renderer = PVPRenderScheduler(PVP_RENDER_INTERVAL)
+
+async def finish_pvp_event(message_id: int, guild_id: int = None):
+    async with pvp_renderer.lock(message_id):
+        event = await storage.close_pvp_event(message_id, guild_id)
+    if event is None:
+        return None
+
+    channel = bot.get_channel(event.channel_id)
+    if channel is not None:
+        pvp_renderer.schedule(channel.get_partial_message(message_id))
+    return event
+
+async def journal_snapshot_loop():
+    journal = db.journal
+    while True:
+        await asyncio.sleep(JOURNAL_CHECK_INTERVAL)
+        if journal.entries < JOURNAL_SNAPSHOT_ENTRIES and time.monotonic() - journal.last_snapshot < JOURNAL_SNAPSHOT_INTERVAL.total_seconds():
+            continue
+
+        try:
+            start = time.perf_counter()
+            entries = journal.entries
+            seq = await db.run(snapshot_database, journal)
+            print(f"Snapshot do banco gravado até a entrada {seq} ({entries} entradas compactadas) em {(time.perf_counter() - start) * 1000:.0f}ms.")
+        except Exception as e:
+            print(f"Erro ao gravar snapshot do banco: {e}")
+
+async def pvp_lifecycle_loop():
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        try:
+            now = get_timestamp()
+            for message_id, _ in await storage.get_due_pvp_events(now):
+                event = await finish_pvp_event(message_id)
+                if event is not None:
+                    print(f"Evento PVP {message_id} encerrado automaticamente com {len(event.confirmados)} confirmados.")
+
+            moved = await storage.prune_closed_pvp_events(now - int(PVP_PRUNE_AFTER.total_seconds()))
+            if moved:
+                print(f"{moved} confirmações de eventos PVP encerrados movidas para {ARCHIVE_DB_FILE}.")
+        except Exception as e:
+            print(f"Erro no ciclo de eventos PVP: {e}")
+
+        await asyncio.sleep(PVP_LIFECYCLE_INTERVAL)
+
+def build_pvp_roster_embed(event: PVPEventState, status: str, page: int):
+    label, empty = PVP_ROSTER_LABELS[status]
+    text, page, page_count, total, _ = storage.cache.page(event, status, page)
+
+    embed = discord.Embed(
+        title=f"{label} ({total})",
+        description=text or empty,
+        color=0x95A5A6 if event.closed_at is not None else 0xFF4444
+    )
+    embed.set_author(name=event.title)
+    embed.set_footer(text=f"Página {page + 1}/{page_count}")
+    return embed, page, page_count
+
+class PVPRosterView(discord.ui.View):
+    def __init__(self, message_id: int):
+        super().__init__(timeout=HISTORY_VIEW_TIMEOUT)
+        self.message_id = message_id
+        self.status = "confirmado"
+        self.page = 0
+
+    async def render(self):
+        event = storage.cache.get(self.message_id)
+        if event is None:
+            event = await storage.load_pvp_event(self.message_id)
+        if event is None:
+            return None
+
+        embed, self.page, page_count = build_pvp_roster_embed(event, self.status, self.page)
+        self.anterior.disabled = self.page == 0
+        self.proxima.disabled = self.page >= page_count - 1
+        self.confirmados.disabled = self.status == "confirmado"
+        self.recusados.disabled = self.status == "recusado"
+        return embed
+
+    async def show(self, interaction: discord.Interaction):
+        embed = await self.render()
+        if embed is None:
+            await interaction.response.edit_message(content="❌ Evento não encontrado.", embed=None, view=None)
+            return
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="✅ Confirmados", style=discord.ButtonStyle.success, row=0)
+    @instrumented
+    async def confirmados(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.status = "confirmado"
+        self.page = 0
+        await self.show(interaction)
+
+    @discord.ui.button(label="❌ Não vão", style=discord.ButtonStyle.danger, row=0)
+    @instrumented
+    async def recusados(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.status = "recusado"
+        self.page = 0
+        await self.show(interaction)
+
+    @discord.ui.button(label="◀ Anterior", style=discord.ButtonStyle.secondary, row=1)
+    @instrumented
+    async def anterior(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await self.show(interaction)
+
+    @discord.ui.button(label="Próxima ▶", style=discord.ButtonStyle.secondary, row=1)
+    @instrumented
+    async def proxima(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self.show(interaction)
+
+class PVPEventView(discord.ui.View):
+    def __init__(self, closed: bool = False):
+        super().__init__(timeout=None)
+        for item in self.children:
+            item.disabled = closed and item is not self.lista
+
+    @discord.ui.button(label="Participar", style=discord.ButtonStyle.success, custom_id="pvp_participar")
+    @instrumented
+    async def participar(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.defer()
+
+        async with pvp_renderer.lock(interaction.message.id):
+            accepted = await storage.upsert_confirmation(
+                guild_id=interaction.guild_id,
+                message_id=interaction.message.id,
+                user_id=interaction.user.id,
+                user_name=interaction.user.display_name,
+                status="confirmado"
+            )
+
+        if not accepted:
+            await interaction.followup.send("🔒 Este evento já foi encerrado.", ephemeral=True)
+            return
+
+        pvp_renderer.schedule(interaction.message)
+
+    @discord.ui.button(label="Não participar", style=discord.ButtonStyle.danger, custom_id="pvp_recusar")
+    @instrumented
+    async def recusar(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.defer()
+
+        async with pvp_renderer.lock(interaction.message.id):
+            accepted = await storage.upsert_confirmation(
+                guild_id=interaction.guild_id,
+                message_id=interaction.message.id,
+                user_id=interaction.user.id,
+                user_name=interaction.user.display_name,
+                status="recusado"
+            )
+
+        if not accepted:
+            await interaction.followup.send("🔒 Este evento já foi encerrado.", ephemeral=True)
+            return
+
+        pvp_renderer.schedule(interaction.message)
+
+    @discord.ui.button(label="Remover minha resposta", style=discord.ButtonStyle.secondary, custom_id="pvp_remover")
+    @instrumented
+    async def remover(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.defer()
+
+        async with pvp_renderer.lock(interaction.message.id):
+            accepted = await storage.delete_confirmation(
+                message_id=interaction.message.id,
+                user_id=interaction.user.id
+            )
+
+        if not accepted:
+            await interaction.followup.send("🔒 Este evento já foi encerrado.", ephemeral=True)
+            return
+
+        pvp_renderer.schedule(interaction.message)
+
+    @discord.ui.button(label="📋 Ver lista", style=discord.ButtonStyle.primary, custom_id="pvp_lista")
+    @instrumented
+    async def lista(self, interaction: discord.Interaction, button: discord.ui.Button):
+        view = PVPRosterView(interaction.message.id)
+        embed = await view.render()
+        if embed is None:
+            await interaction.response.send_message("❌ Evento não encontrado.", ephemeral=True)
+            return
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+
+SPARKLINE_BLOCKS = "▁▂▃▄▅▆▇█"
+
+def sparkline(values):
+    peak = max(values)
+    if peak <= 0:
+        return SPARKLINE_BLOCKS[0] * len(values)
+    return "".join(SPARKLINE_BLOCKS[round(value / peak * (len(SPARKLINE_BLOCKS) - 1))] for value in values)
+
+def count_pages(total: int, page_size: int):
+    return max((total + page_size - 1) // page_size, 1)
+
+def build_history_embed(guild_id: int, week_keys, rows, page: int):
+    embed = discord.Embed(
+        title="📈 Histórico de farms e PVP",
+        description=f"Semanas `{week_keys[0]}` a `{week_keys[-1]}` ({len(week_keys)} semanas).",
+        color=0x1ABC9C
+    )
+
+    start = page * HISTORY_PAGE_SIZE
+    for position, (membro_id, membro, pedra, semente, total, semanas, pvp) in enumerate(rows[start:start + HISTORY_PAGE_SIZE], start=start + 1):
+        embed.add_field(
+            name=f"{position}. {member_display_name(guild_id, membro_id, membro)}",
+            value=(
+                f"Pedra: {pedra:.0f} un | Semente: {semente:.0f} un\n"
+                f"Total: {total:.0f} un em {semanas} semanas | PVP: {int(pvp)} confirmações"
+            ),
+            inline=False
+        )
+
+    embed.set_footer(text=f"Página {page + 1}/{count_pages(len(rows), HISTORY_PAGE_SIZE)}")
+    return embed
+
+def build_member_history_embed(name: str, rows, page: int):
+    total = sum(row[3] for row in rows)
+    pvp = sum(row[4] for row in rows)
+    embed = discord.Embed(
+        title=f"📈 Histórico de {name}",
+        description=(
+            f"Semanas `{rows[0][0]}` a `{rows[-1][0]}`: "
+            f"{total:.0f} un farmadas e {int(pvp)} confirmações PVP."
+        ),
+        color=0x1ABC9C
+    )
+
+    start = page * HISTORY_PAGE_SIZE
+    for week_key, pedra, semente, total, pvp in rows[start:start + HISTORY_PAGE_SIZE]:
+        embed.add_field(
+            name=week_key,
+            value=f"Pedra: {pedra:.0f} un | Semente: {semente:.0f} un\nTotal: {total:.0f} un | PVP: {int(pvp)} confirmações",
+            inline=False
+        )
+
+    embed.set_footer(text=f"Página {page + 1}/{count_pages(len(rows), HISTORY_PAGE_SIZE)}")
+    return embed
+
+class HistoryView(discord.ui.View):
+    def __init__(self, page_count: int, render):
+        super().__init__(timeout=HISTORY_VIEW_TIMEOUT)
+        self.page_count = page_count
+        self.render = render
+        self.page = 0
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.anterior.disabled = self.page == 0
+        self.proxima.disabled = self.page >= self.page_count - 1
+
+    async def show(self, interaction: discord.Interaction):
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.render(self.page), view=self)
+
+    @discord.ui.button(label="◀ Anterior", style=discord.ButtonStyle.secondary)
+    @instrumented
+    async def anterior(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(self.page - 1, 0)
+        await self.show(interaction)
+
+    @discord.ui.button(label="Próxima ▶", style=discord.ButtonStyle.secondary)
+    @instrumented
+    async def proxima(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = min(self.page + 1, self.page_count - 1)
+        await self.show(interaction)
+
+def build_ranking_embed(guild_id: int, week_key: str, rows, footer: str, partial: bool = False):
+    embed = discord.Embed(
+        title="🏆 Parcial semanal de farms" if partial else "🏆 Fechamento semanal de farms",
+        description=(
+            f"Parcial da semana `{week_key}`, ainda em andamento." if partial
+            else f"Resultado oficial da semana `{week_key}`."
+        ),
+        color=0xE67E22
+    )
+
+    medals = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
+
+    for i, (membro_id, membro, pedra, semente, total) in enumerate(rows):
+        embed.add_field(
+            name=f"{medals[i]} {member_display_name(guild_id, membro_id, membro)}",
+            value=f"Pedra: {pedra:.0f} un\nSemente: {semente:.0f} un\nTotal: {total:.0f} un",
+            inline=False
+        )
+
+    embed.set_footer(text=footer)
+    return embed
+
+class WeeklyCloseScheduler:
+    def __init__(self, delay: timedelta, precompute: timedelta, max_catch_up: int, retry_interval: timedelta):
+        self.delay = delay
+        self.precompute = precompute
+        self.max_catch_up = max_catch_up
+        self.retry_interval = retry_interval
+        self.prepared = {}
+        self.lock = asyncio.Lock()
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def last_due_week(self, now: datetime):
+        return get_week_key(now - self.delay - timedelta(weeks=1))
+
+    def due_weeks(self, last_closed: str, now: datetime):
+        last_due = self.last_due_week(now)
+        if last_closed is None:
+            return [last_due]
+
+        weeks = []
+        week_start = get_week_start(last_closed) + timedelta(weeks=1)
+        while week_start <= get_week_start(last_due):
+            weeks.append(get_week_key(week_start))
+            week_start += timedelta(weeks=1)
+        return weeks[-self.max_catch_up:]
+
+    async def run(self):
+        await bot.wait_until_ready()
+        while not bot.is_closed():
+            try:
+                if not await self.catch_up():
+                    await asyncio.sleep(self.retry_interval.total_seconds())
+                    continue
+
+                now = datetime.now(timezone.utc)
+                next_week = get_week_start(self.last_due_week(now)) + timedelta(weeks=1)
+                week_end = next_week + timedelta(weeks=1)
+                close_at = week_end + self.delay
+                # A semana só fica imutável depois da virada, então o pré-cálculo nunca acontece antes dela.
+                precompute_at = max(close_at - self.precompute, week_end)
+
+                await discord.utils.sleep_until(precompute_at)
+                await self.prepare(get_week_key(next_week))
+                await discord.utils.sleep_until(close_at)
+            except Exception as e:
+                print(f"Erro no fechamento automático: {e}")
+                await asyncio.sleep(60)
+
+    async def prepare(self, week_key: str):
+        for guild_id in guild_configs:
+            self.prepared[guild_id, week_key] = await storage.get_week_ranking(guild_id, week_key)
+        print(f"Ranking da semana {week_key} pré-calculado para o fechamento automático.")
+
+    async def catch_up(self):
+        now = datetime.now(timezone.utc)
+        completed = True
+        closed_any = False
+
+        for guild_id, config in guild_configs.items():
+            state_key = f"last_closed_week:{guild_id}"
+            last_closed = await storage.get_state(state_key)
+
+            for week_key in self.due_weeks(last_closed, now):
+                # O progresso só avança depois da publicação; uma falha é repetida na próxima tentativa.
+                if not await self.close(guild_id, config, week_key):
+                    completed = False
+                    break
+                await storage.set_state(state_key, week_key)
+                closed_any = True
+
+        if completed:
+            self.prepared.clear()
+        if closed_any and ARCHIVE_RETENTION_WEEKS is not None:
+            archived = await storage.archive_old_weeks(ARCHIVE_RETENTION_WEEKS)
+            if archived:
+                print(f"{archived} registros antigos movidos para {ARCHIVE_DB_FILE}.")
+        return completed
+
+    async def close(self, guild_id: int, config: GuildConfig, week_key: str):
+        rows = self.prepared.get((guild_id, week_key))
+        if rows is None:
+            rows = await storage.get_week_ranking(guild_id, week_key)
+
+        async with self.lock:
+            # O snapshot é gravado uma única vez; numa nova tentativa close_week não altera nada.
+            await storage.close_week(guild_id, week_key, bot.user.id, "Fechamento automático")
+            # Semana já publicada (pelo /fechamento ou antes de um reinício) não é postada de novo.
+            if await storage.is_week_published(guild_id, week_key):
+                return True
+            if not rows:
+                await storage.mark_week_published(guild_id, week_key)
+                return True
 
-    confirmados = [name for name, status in rows if status == "confirmado"]
-    recusados = [name for name, status in rows if status == "recusado"]
-    return confirmados, recusados
+            channel = bot.get_channel(config.ranking_channel_id)
+            if channel is None:
+                print(f"Canal de ranking do servidor {guild_id} não encontrado; publicação da semana {week_key} será repetida.")
+                return False
 
-def get_top_pvp(limit=10):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT user_name, COUNT(*) as total
-        FROM pvp_confirmations pc
-        JOIN pvp_events pe ON pe.message_id = pc.message_id
-        WHERE pe.week_key = ? AND pc.status = 'confirmado'
-        GROUP BY user_name
-        ORDER BY total DESC
-        LIMIT ?
-    """, (get_week_key(), limit))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+            try:
+                await channel.send(embed=build_ranking_embed(guild_id, week_key, rows, "Publicado automaticamente"))
+                print(f"Fechamento automático da semana {week_key} publicado no servidor {guild_id}.")
+            except discord.HTTPException as e:
+                print(f"Erro ao publicar fechamento automático da semana {week_key}; nova tentativa em breve: {e}")
+                return False
+            await storage.mark_week_published(guild_id, week_key)
+            return True
 
-def build_pvp_embed(message_id: int, title: str, description: str, creator_name: str):
-    confirmados, recusados = get_event_lists(message_id)
+weekly_closer = WeeklyCloseScheduler(AUTO_CLOSE_DELAY, AUTO_CLOSE_PRECOMPUTE, AUTO_CLOSE_MAX_CATCH_UP, AUTO_CLOSE_RETRY_INTERVAL)
 
-    embed = discord.Embed(
-        title=title,
-        description=description,
-        color=0xFF4444
-    )
+# O event loop só guarda referências fracas às tarefas; sem esta, um laço poderia ser coletado no meio.
+background_tasks = set()
 
-    embed.add_field(
-        name=f"✅ Confirmados ({len(confirmados)})",
-        value="\n".join(confirmados[:30]) if confirmados else "Ninguém confirmou ainda.",
-        inline=True
-    )
+def start_background_task(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(finish_background_task)
+    return task
 
-    embed.add_field(
-        name=f"❌ Não vão ({len(recusados)})",
-        value="\n".join(recusados[:30]) if recusados else "Ninguém recusou ainda.",
-        inline=True
-    )
+def finish_background_task(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Tarefa em segundo plano {task.get_coro().__qualname__} encerrada com erro: {task.exception()!r}")
 
-    embed.add_field(
-        name="Como responder",
-        value="Use os botões abaixo para confirmar, recusar ou remover sua resposta.",
-        inline=False
+@contextlib.contextmanager
+def startup_phase(name: str):
+    start = time.perf_counter()
+    yield
+    print(f"Inicialização: {name} em {(time.perf_counter() - start) * 1000:.0f}ms")
+
+def get_command_tree_hash(guild: discord.abc.Snowflake) -> str:
+    payload = sorted(
+        (command.to_dict() for command in bot.tree.get_commands(guild=guild)),
+        key=lambda command: command["name"]
     )
+    data = json.dumps({"guild_id": guild.id, "commands": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
 
-    embed.set_footer(text=f"Criado por {creator_name}")
-    return embed
+async def sync_commands_if_changed(guild: discord.abc.Snowflake):
+    state_key = f"command_tree_hash:{guild.id}"
+    current_hash = get_command_tree_hash(guild)
+    if await db.run(get_state, state_key) == current_hash:
+        print(f"Slash commands do servidor {guild.id} sem alterações; sincronização ignorada.")
+        return
 
-class PVPEventView(discord.ui.View):
-    def __init__(self):
-        super().__init__(timeout=None)
+    try:
+        synced = await bot.tree.sync(guild=guild)
+    except Exception as e:
+        print(f"Erro ao sincronizar comandos: {e}")
+        return
 
-    @discord.ui.button(label="Participar", style=discord.ButtonStyle.success, custom_id="pvp_participar")
-    async def participar(self, interaction: discord.Interaction, button: discord.ui.Button):
-        upsert_confirmation(
-            message_id=interaction.message.id,
-            user_id=interaction.user.id,
-            user_name=interaction.user.display_name,
-            status="confirmado"
-        )
+    await db.run(set_state, state_key, current_hash)
+    print(f"{len(synced)} slash commands sincronizados no servidor {guild.id}.")
 
-        embed = build_pvp_embed(
-            interaction.message.id,
-            interaction.message.embeds[0].title,
-            interaction.message.embeds[0].description,
-            interaction.message.embeds[0].footer.text.replace("Criado por ", "")
-        )
+@bot.event
+async def setup_hook():
+    startup_start = time.perf_counter()
 
-        await interaction.response.edit_message(embed=embed, view=self)
+    with startup_phase("migrações do banco"):
+        await db.run(init_db)
 
-    @discord.ui.button(label="Não participar", style=discord.ButtonStyle.danger, custom_id="pvp_recusar")
-    async def recusar(self, interaction: discord.Interaction, button: discord.ui.Button):
-        upsert_confirmation(
-            message_id=interaction.message.id,
-            user_id=interaction.user.id,
-            user_name=interaction.user.display_name,
-            status="recusado"
-        )
+    with startup_phase("cache de eventos PVP"):
+        cached = await db.run(warm_pvp_cache)
+        print(f"{cached} eventos PVP carregados em cache.")
 
-        embed = build_pvp_embed(
-            interaction.message.id,
-            interaction.message.embeds[0].title,
-            interaction.message.embeds[0].description,
-            interaction.message.embeds[0].footer.text.replace("Criado por ", "")
-        )
+    if db.journal is not None and not os.path.exists(db.journal.snapshot_path):
+        with startup_phase("snapshot inicial do diário"):
+            await db.run(snapshot_database, db.journal)
 
-        await interaction.response.edit_message(embed=embed, view=self)
+    bot.add_view(PVPEventView())
+    welcome_dms.start()
+    if AUTO_CLOSE_ENABLED:
+        weekly_closer.start()
+    start_background_task(pvp_lifecycle_loop())
+    if db.journal is not None:
+        start_background_task(journal_snapshot_loop())
 
-    @discord.ui.button(label="Remover minha resposta", style=discord.ButtonStyle.secondary, custom_id="pvp_remover")
-    async def remover(self, interaction: discord.Interaction, button: discord.ui.Button):
-        delete_confirmation(
-            message_id=interaction.message.id,
-            user_id=interaction.user.id
-        )
+    if metrics.enabled:
+        start_background_task(metrics_loop())
 
-        embed = build_pvp_embed(
-            interaction.message.id,
-            interaction.message.embeds[0].title,
-            interaction.message.embeds[0].description,
-            interaction.message.embeds[0].footer.text.replace("Criado por ", "")
-        )
+    with startup_phase("sincronização de slash commands"):
+        for guild in guild_objs:
+            await sync_commands_if_changed(guild)
 
-        await interaction.response.edit_message(embed=embed, view=self)
+    print(f"Inicialização concluída em {(time.perf_counter() - startup_start) * 1000:.0f}ms")
+
+async def reconcile_legacy_farm_members(guild_id: int):
+    state_key = f"legacy_farm_members:{guild_id}"
+    if await db.run(get_state, state_key) is not None:
+        return
+
+    index = member_indexes[guild_id]
+    legacy = await db.run(get_legacy_farm_members, guild_id)
+    assignments = []
+    for legacy_id, membro in legacy:
+        membro_id = index.resolve(membro)
+        if membro_id is not None:
+            assignments.append((legacy_id, membro_id))
+
+    if assignments:
+        updated = await db.run(assign_legacy_farm_members, guild_id, assignments)
+        print(f"{updated} farms antigos associados a {len(assignments)} membros no servidor {guild_id}.")
+
+    await db.run(set_state, state_key, str(len(legacy) - len(assignments)))
+
+async def reconcile_pvp_user_names(guild_id: int):
+    state_key = f"pvp_user_names:{guild_id}"
+    if await db.run(get_state, state_key) is not None:
+        return
+
+    updated = await db.run(refresh_pvp_user_names, guild_id, dict(member_indexes[guild_id].names))
+    if updated:
+        print(f"{updated} confirmações PVP atualizadas com o nome atual dos membros no servidor {guild_id}.")
+
+    await db.run(set_state, state_key, str(updated))
 
 @bot.event
 async def on_ready():
-    init_db()
-    bot.add_view(PVPEventView())
+    for guild in bot.guilds:
+        if guild.id not in guild_configs:
+            continue
 
-    try:
-        synced = await bot.tree.sync(guild=guild_obj)
-        print(f"{bot.user} online com sucesso!")
-        print(f"{len(synced)} slash commands sincronizados.")
-    except Exception as e:
-        print(f"Erro ao sincronizar comandos: {e}")
+        with startup_phase(f"índice de membros do servidor {guild.id}"):
+            member_indexes[guild.id].rebuild(guild.members)
+        await reconcile_legacy_farm_members(guild.id)
+        await reconcile_pvp_user_names(guild.id)
 
-    await bot.change_presence(
-        activity=discord.Game(
-            name="/farm | /previewtop | /fechamento | /pvpevent | /removerpvp | /toppvp"
-        )
+    print(f"{bot.user} online com sucesso!")
+
+class MemberLogBatcher:
+    MESSAGE_LIMIT = 2000
+
+    def __init__(self, channel_id: int, interval: float, max_pending: int):
+        self.channel_id = channel_id
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending = []
+        self.dropped = 0
+        self.task = None
+
+    def add(self, line: str):
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            metrics.increment("member_log_dropped")
+        else:
+            self.pending.append(line)
+
+        if self.task is None:
+            self.task = asyncio.create_task(self.flush_later())
+
+    def chunks(self, lines):
+        chunk = ""
+        for line in lines:
+            if chunk and len(chunk) + len(line) + 1 > self.MESSAGE_LIMIT:
+                yield chunk
+                chunk = ""
+            chunk = f"{chunk}\n{line}" if chunk else line[:self.MESSAGE_LIMIT]
+        if chunk:
+            yield chunk
+
+    async def flush_later(self):
+        try:
+            await asyncio.sleep(self.interval)
+            lines, self.pending = self.pending, []
+            if self.dropped:
+                lines.append(f"⚠️ {self.dropped} entradas/saídas não registradas (fila cheia).")
+                self.dropped = 0
+
+            channel = bot.get_channel(self.channel_id)
+            if channel is None:
+                return
+
+            for chunk in self.chunks(lines):
+                try:
+                    await channel.send(chunk)
+                except discord.HTTPException as e:
+                    print(f"Erro ao enviar log de membros: {e}")
+        finally:
+            self.task = None
+            if self.pending:
+                self.task = asyncio.create_task(self.flush_later())
+
+class WelcomeDMQueue:
+    def __init__(self, max_size: int, workers: int, retries: int):
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.workers = workers
+        self.retries = retries
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.tasks = []
+
+    def start(self):
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    def submit(self, member: discord.Member):
+        try:
+            self.queue.put_nowait(member)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            metrics.increment("welcome_dm_dropped")
+
+    async def worker(self):
+        while True:
+            member = await self.queue.get()
+            try:
+                await self.send(member)
+            finally:
+                self.queue.task_done()
+
+    async def send(self, member: discord.Member):
+        for attempt in range(self.retries):
+            try:
+                await member.send(embed=build_welcome_embed())
+                self.sent += 1
+                return
+            except discord.Forbidden:
+                return
+            except discord.HTTPException:
+                await asyncio.sleep(2 ** attempt)
+
+        self.failed += 1
+        metrics.increment("welcome_dm_failed")
+
+def build_welcome_embed():
+    embed = discord.Embed(
+        title="🎉 Bem-vindo à facção!",
+        description="Use `/tutorial` para aprender os comandos disponíveis.",
+        color=0x00FF88
     )
+    embed.add_field(name="Comandos", value="`/tutorial`", inline=False)
+    embed.set_footer(text="Mensagem automática de boas-vindas")
+    return embed
+
+member_logs = {
+    guild_id: MemberLogBatcher(config.welcome_log_channel_id, MEMBER_LOG_INTERVAL, MEMBER_LOG_MAX_PENDING)
+    for guild_id, config in guild_configs.items()
+}
+welcome_dms = WelcomeDMQueue(WELCOME_DM_QUEUE_SIZE, WELCOME_DM_WORKERS, WELCOME_DM_RETRIES)
 
 @bot.event
 async def on_member_join(member):
-    try:
-        embed = discord.Embed(
-            title="🎉 Bem-vindo à facção!",
-            description="Use `/tutorial` para aprender os comandos disponíveis.",
-            color=0x00FF88
-        )
-        embed.add_field(name="Comandos", value="`/tutorial`", inline=False)
-        embed.set_footer(text="Mensagem automática de boas-vindas")
-        await member.send(embed=embed)
-    except:
-        pass
+    member_log = member_logs.get(member.guild.id)
+    if member_log is None:
+        return
 
-    channel = bot.get_channel(WELCOME_LOG_CHANNEL_ID)
-    if channel:
-        await channel.send(f"➕ **Entrada:** {member.mention} | `{member.id}`")
+    member_indexes[member.guild.id].add(member)
+    welcome_dms.submit(member)
+    member_log.add(f"➕ **Entrada:** {member.mention} | `{member.id}`")
 
 @bot.event
 async def on_member_remove(member):
-    channel = bot.get_channel(WELCOME_LOG_CHANNEL_ID)
-    if channel:
-        await channel.send(f"➖ **Saída:** {member.display_name} | `{member.id}`")
+    member_log = member_logs.get(member.guild.id)
+    if member_log is None:
+        return
+
+    member_indexes[member.guild.id].remove(member.id)
+    member_log.add(f"➖ **Saída:** {member.display_name} | `{member.id}`")
+
+@bot.event
+async def on_member_update(before, after):
+    if after.guild.id in guild_configs and before.display_name != after.display_name:
+        member_indexes[after.guild.id].add(after)
+
+@bot.event
+async def on_user_update(before, after):
+    if before.display_name == after.display_name:
+        return
 
-@bot.tree.command(name="farm", description="Registrar um farm para um membro", guild=guild_obj)
+    for guild_id in guild_configs:
+        guild = bot.get_guild(guild_id)
+        member = guild.get_member(after.id) if guild is not None else None
+        if member is not None:
+            member_indexes[guild_id].add(member)
+
+@bot.tree.command(name="farm", description="Registrar um farm para um membro", guilds=guild_objs)
 @app_commands.describe(
-    membro="Nome do membro que recebeu o farm",
+    membro="Membro que recebeu o farm (escolha na lista)",
     qtd="Quantidade farmada",
     farm="Escolha o tipo de farm"
 )
@@ -347,29 +3630,100 @@ async def on_member_remove(member):
     app_commands.Choice(name="Pedra", value="Pedra"),
     app_commands.Choice(name="Semente", value="Semente"),
 ])
+@instrumented
 async def farm(interaction: discord.Interaction, membro: str, qtd: float, farm: app_commands.Choice[str]):
     if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
         await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
         return
 
-    add_farm(membro, farm.value, qtd, interaction.user.id, interaction.user.display_name)
+    index = member_indexes[interaction.guild_id]
+    membro_id = index.resolve(membro)
+    if membro_id is None:
+        await interaction.response.send_message("❌ Membro não encontrado. Escolha um membro da lista de sugestões.", ephemeral=True)
+        return
+
+    await storage.add_farm(interaction.guild_id, membro_id, index.names[membro_id], farm.value, qtd, interaction.user.id, interaction.user.display_name)
 
     embed = discord.Embed(title="✅ Farm registrado", color=0x00FF88)
-    embed.add_field(name="Membro", value=membro, inline=False)
+    embed.add_field(name="Membro", value=f"<@{membro_id}>", inline=False)
     embed.add_field(name="Farm desejado", value=farm.value, inline=True)
     embed.add_field(name="Quantidade", value=f"{qtd} un", inline=True)
     embed.add_field(name="Adicionado por", value=interaction.user.mention, inline=False)
-    embed.set_footer(text=f"Registrado em {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    embed.set_footer(text="Registrado")
+    embed.timestamp = datetime.fromtimestamp(get_timestamp(), timezone.utc)
 
     await interaction.response.send_message(embed=embed)
 
-@bot.tree.command(name="previewtop", description="Ver ranking privado antes do fechamento", guild=guild_obj)
+@farm.autocomplete("membro")
+@instrumented
+async def farm_membro_autocomplete(interaction: discord.Interaction, current: str):
+    return member_choices(interaction.guild_id, current)
+
+@bot.tree.command(name="farmlote", description="Registrar vários farms de uma vez", guilds=guild_objs)
+@app_commands.describe(
+    texto="Linhas no formato membro;tipo;qtd, separadas por |",
+    arquivo="Arquivo CSV com linhas no formato membro;tipo;qtd"
+)
+@instrumented
+async def farmlote(interaction: discord.Interaction, texto: str = None, arquivo: discord.Attachment = None):
+    if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
+        await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
+        return
+
+    if texto is None and arquivo is None:
+        await interaction.response.send_message("❌ Envie as linhas no campo `texto` ou um arquivo CSV.", ephemeral=True)
+        return
+
+    if arquivo is not None and arquivo.size > FARM_BULK_MAX_BYTES:
+        await interaction.response.send_message(
+            f"❌ O arquivo tem {arquivo.size / 1024 / 1024:.1f} MB; o limite é {FARM_BULK_MAX_BYTES / 1024 / 1024:.0f} MB.",
+            ephemeral=True
+        )
+        return
+
+    await interaction.response.defer(thinking=True)
+
+    content = await arquivo.read() if arquivo is not None else texto.replace("|", "\n")
+    rows, errors = await asyncio.to_thread(prepare_farm_batch, content, member_indexes[interaction.guild_id])
+
+    if len(rows) > FARM_BULK_MAX_LINES:
+        errors.append(f"O lote tem {len(rows)} linhas; o limite é {FARM_BULK_MAX_LINES}.")
+
+    if errors:
+        embed = discord.Embed(
+            title="❌ Lote de farms recusado",
+            description="Nenhum farm foi registrado. Corrija as linhas abaixo e envie novamente.",
+            color=0xE74C3C
+        )
+        embed.add_field(name=f"Erros ({len(errors)})", value="\n".join(errors[:15])[:1024], inline=False)
+        await interaction.followup.send(embed=embed)
+        return
+
+    if not rows:
+        await interaction.followup.send("📭 Nenhuma linha de farm encontrada no lote.")
+        return
+
+    totals = await storage.add_farms_bulk(interaction.guild_id, rows, interaction.user.id, interaction.user.display_name)
+
+    embed = discord.Embed(title="✅ Lote de farms registrado", color=0x00FF88)
+    embed.add_field(name="Linhas", value=str(len(rows)), inline=True)
+    embed.add_field(name="Membros", value=str(len(totals)), inline=True)
+    embed.add_field(name="Pedra", value=f"{sum(values[0] for values in totals.values()):.0f} un", inline=True)
+    embed.add_field(name="Semente", value=f"{sum(values[1] for values in totals.values()):.0f} un", inline=True)
+    embed.add_field(name="Adicionado por", value=interaction.user.mention, inline=False)
+    embed.set_footer(text="Registrado")
+    embed.timestamp = datetime.fromtimestamp(get_timestamp(), timezone.utc)
+
+    await interaction.followup.send(embed=embed)
+
+@bot.tree.command(name="previewtop", description="Ver ranking privado antes do fechamento", guilds=guild_objs)
+@instrumented
 async def previewtop(interaction: discord.Interaction):
     if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
         await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
         return
 
-    rows = get_farm_breakdown(limit=10)
+    rows = await storage.get_farm_breakdown(interaction.guild_id, limit=10)
 
     if not rows:
         await interaction.response.send_message("📭 Ainda não há farms registrados nesta semana.", ephemeral=True)
@@ -383,9 +3737,9 @@ async def previewtop(interaction: discord.Interaction):
 
     medals = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
 
-    for i, (membro, pedra, semente, total) in enumerate(rows):
+    for i, (membro_id, membro, pedra, semente, total) in enumerate(rows):
         embed.add_field(
-            name=f"{medals[i]} {membro}",
+            name=f"{medals[i]} {member_display_name(interaction.guild_id, membro_id, membro)}",
             value=f"Pedra: {pedra:.0f} un\nSemente: {semente:.0f} un\nTotal: {total:.0f} un",
             inline=False
         )
@@ -393,77 +3747,139 @@ async def previewtop(interaction: discord.Interaction):
     embed.set_footer(text=f"Semana atual: {get_week_key()}")
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
-@bot.tree.command(name="fechamento", description="Publicar ranking semanal no canal oficial", guild=guild_obj)
-async def fechamento(interaction: discord.Interaction):
+@bot.tree.command(name="fechamento", description="Publicar ranking semanal no canal oficial", guilds=guild_objs)
+@app_commands.describe(parcial="Publicar a parcial da semana atual em vez do fechamento oficial da semana anterior")
+@instrumented
+async def fechamento(interaction: discord.Interaction, parcial: bool = False):
     if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
         await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
         return
 
-    rows = get_farm_breakdown(limit=10)
-
-    if not rows:
-        await interaction.response.send_message("📭 Não há farms registrados para publicar nesta semana.", ephemeral=True)
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    ranking_channel = interaction.guild.get_channel(guild_configs[interaction.guild_id].ranking_channel_id)
+    if ranking_channel is None:
+        await interaction.followup.send("❌ Não encontrei o canal de ranking configurado.", ephemeral=True)
         return
 
-    ranking_channel = interaction.guild.get_channel(RANKING_CHANNEL_ID)
-    if ranking_channel is None:
-        await interaction.response.send_message("❌ Não encontrei o canal de ranking configurado.", ephemeral=True)
+    if parcial:
+        # A semana atual ainda está aberta: a parcial não grava snapshot.
+        week_key = get_week_key()
+        rows = await storage.get_farm_breakdown(interaction.guild_id, limit=10)
+        if not rows:
+            await interaction.followup.send("📭 Não há farms registrados para publicar nesta semana.", ephemeral=True)
+            return
+
+        embed = build_ranking_embed(interaction.guild_id, week_key, rows, f"Publicado por {interaction.user.display_name}", partial=True)
+        await ranking_channel.send(embed=embed)
+        await interaction.followup.send(f"✅ Parcial da semana `{week_key}` publicada em {ranking_channel.mention}.", ephemeral=True)
         return
 
-    embed = discord.Embed(
-        title="🏆 Fechamento semanal de farms",
-        description=f"Resultado oficial da semana `{get_week_key()}`.",
-        color=0xE67E22
-    )
+    week_key = get_week_key(get_week_start(get_week_key()) - timedelta(weeks=1))
+    async with weekly_closer.lock:
+        created = await storage.close_week(interaction.guild_id, week_key, interaction.user.id, interaction.user.display_name)
+        if await storage.is_week_published(interaction.guild_id, week_key):
+            await interaction.followup.send(f"ℹ️ O fechamento da semana `{week_key}` já foi publicado.", ephemeral=True)
+            return
 
-    medals = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
+        rows = await storage.get_week_ranking(interaction.guild_id, week_key)
+        if not rows:
+            await interaction.followup.send(f"📭 Não há farms registrados na semana `{week_key}`.", ephemeral=True)
+            return
 
-    for i, (membro, pedra, semente, total) in enumerate(rows):
-        embed.add_field(
-            name=f"{medals[i]} {membro}",
-            value=f"Pedra: {pedra:.0f} un\nSemente: {semente:.0f} un\nTotal: {total:.0f} un",
-            inline=False
-        )
+        embed = build_ranking_embed(interaction.guild_id, week_key, rows, f"Publicado por {interaction.user.display_name}")
+        await ranking_channel.send(embed=embed)
+        await storage.mark_week_published(interaction.guild_id, week_key)
 
-    embed.set_footer(text=f"Publicado por {interaction.user.display_name}")
-    await ranking_channel.send(embed=embed)
-    await interaction.response.send_message(f"✅ Fechamento publicado com sucesso em {ranking_channel.mention}.", ephemeral=True)
+    if created and ARCHIVE_RETENTION_WEEKS is not None:
+        archived = await storage.archive_old_weeks(ARCHIVE_RETENTION_WEEKS)
+        if archived:
+            print(f"{archived} registros antigos movidos para {ARCHIVE_DB_FILE}.")
+    await interaction.followup.send(f"✅ Fechamento da semana `{week_key}` publicado em {ranking_channel.mention}.", ephemeral=True)
 
-@bot.tree.command(name="pvpevent", description="Criar evento PVP com confirmação por botões", guild=guild_obj)
-@app_commands.describe(titulo="Título do evento", mensagem="Descrição da ação PVP")
-async def pvpevent(interaction: discord.Interaction, titulo: str, mensagem: str):
+@bot.tree.command(name="pvpevent", description="Criar evento PVP com confirmação por botões", guilds=guild_objs)
+@app_commands.describe(
+    titulo="Título do evento",
+    mensagem="Descrição da ação PVP",
+    inicio="Horário de início (dd/mm/aaaa HH:MM ou dd/mm HH:MM, horário de Brasília)"
+)
+@instrumented
+async def pvpevent(interaction: discord.Interaction, titulo: str, mensagem: str, inicio: str = None):
     if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
         await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
         return
 
-    temp_embed = discord.Embed(
-        title=f"⚔️ {titulo}",
-        description=mensagem,
-        color=0xFF4444
+    starts_at = None
+    if inicio is not None:
+        try:
+            starts_at = parse_event_start(inicio)
+        except ValueError:
+            await interaction.response.send_message("❌ Horário inválido. Use `dd/mm/aaaa HH:MM` ou `dd/mm HH:MM`.", ephemeral=True)
+            return
+
+        if starts_at <= get_timestamp():
+            await interaction.response.send_message("❌ O horário de início já passou. Informe um horário futuro.", ephemeral=True)
+            return
+
+    preview = PVPEventState(
+        interaction.guild_id,
+        0,
+        interaction.channel_id,
+        f"⚔️ {titulo}",
+        mensagem,
+        interaction.user.display_name,
+        get_week_key(),
+        starts_at
     )
-    temp_embed.add_field(name="✅ Confirmados (0)", value="Ninguém confirmou ainda.", inline=True)
-    temp_embed.add_field(name="❌ Não vão (0)", value="Ninguém recusou ainda.", inline=True)
-    temp_embed.add_field(name="Como responder", value="Use os botões abaixo para confirmar, recusar ou remover sua resposta.", inline=False)
-    temp_embed.set_footer(text=f"Criado por {interaction.user.display_name}")
 
     view = PVPEventView()
-    await interaction.response.send_message(embed=temp_embed, view=view)
+    await interaction.response.send_message(embed=build_pvp_embed(preview), view=view)
     msg = await interaction.original_response()
 
-    save_pvp_event(
+    event = await storage.save_pvp_event(
+        guild_id=interaction.guild_id,
         message_id=msg.id,
         channel_id=msg.channel.id,
         title=f"⚔️ {titulo}",
         description=mensagem,
         created_by_id=interaction.user.id,
-        created_by_name=interaction.user.display_name
+        created_by_name=interaction.user.display_name,
+        starts_at=starts_at
+    )
+
+    if event.confirmados or event.recusados:
+        pvp_renderer.schedule(msg)
+
+@bot.tree.command(name="encerrarpvp", description="Encerrar um evento PVP e congelar a lista final", guilds=guild_objs)
+@app_commands.describe(mensagem_id="ID da mensagem do evento PVP")
+@instrumented
+async def encerrarpvp(interaction: discord.Interaction, mensagem_id: str):
+    if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
+        await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
+        return
+
+    try:
+        message_id = int(mensagem_id)
+    except:
+        await interaction.response.send_message("❌ O ID da mensagem é inválido.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    event = await finish_pvp_event(message_id, interaction.guild_id)
+    if event is None:
+        await interaction.followup.send("❌ Não encontrei esse evento ou ele já foi encerrado.", ephemeral=True)
+        return
+
+    await interaction.followup.send(
+        f"🔒 Evento encerrado com {len(event.confirmados)} confirmados e {len(event.recusados)} recusas na lista final.",
+        ephemeral=True
     )
 
-@bot.tree.command(name="removerpvp", description="Remover manualmente um membro da lista de um evento PVP", guild=guild_obj)
+@bot.tree.command(name="removerpvp", description="Remover manualmente um membro da lista de um evento PVP", guilds=guild_objs)
 @app_commands.describe(
     mensagem_id="ID da mensagem do evento PVP",
-    membro="Nome exibido do membro para remover da lista"
+    membro="Membro para remover da lista (escolha na lista)"
 )
+@instrumented
 async def removerpvp(interaction: discord.Interaction, mensagem_id: str, membro: str):
     if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
         await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
@@ -475,35 +3891,63 @@ async def removerpvp(interaction: discord.Interaction, mensagem_id: str, membro:
         await interaction.response.send_message("❌ O ID da mensagem é inválido.", ephemeral=True)
         return
 
-    deleted = remove_member_from_event(message_id, membro)
+    user_id = member_indexes[interaction.guild_id].resolve(membro)
+    if user_id is None and membro.strip().isdigit():
+        user_id = int(membro.strip())
+    if user_id is None:
+        await interaction.response.send_message("❌ Membro não encontrado. Escolha um membro da lista de sugestões.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    async with pvp_renderer.lock(message_id):
+        deleted = await storage.remove_member_from_event(interaction.guild_id, message_id, user_id)
+
+    if deleted is None:
+        await interaction.followup.send("🔒 Esse evento já foi encerrado; a lista final não pode ser alterada.", ephemeral=True)
+        return
 
     if deleted == 0:
-        await interaction.response.send_message("❌ Não encontrei esse membro na lista desse evento.", ephemeral=True)
+        await interaction.followup.send("❌ Não encontrei esse membro na lista desse evento.", ephemeral=True)
         return
 
     channel = interaction.channel
     try:
         msg = await channel.fetch_message(message_id)
         if msg.embeds:
-            embed = build_pvp_embed(
-                msg.id,
-                msg.embeds[0].title,
-                msg.embeds[0].description,
-                msg.embeds[0].footer.text.replace("Criado por ", "")
-            )
-            await msg.edit(embed=embed, view=PVPEventView())
+            pvp_renderer.schedule(msg)
     except:
         pass
 
-    await interaction.response.send_message("✅ Membro removido da lista do evento com sucesso.", ephemeral=True)
+    await interaction.followup.send("✅ Membro removido da lista do evento com sucesso.", ephemeral=True)
+
+@removerpvp.autocomplete("membro")
+@instrumented
+async def removerpvp_membro_autocomplete(interaction: discord.Interaction, current: str):
+    try:
+        message_id = int(interaction.namespace.mensagem_id)
+    except (TypeError, ValueError):
+        return member_choices(interaction.guild_id, current)
+
+    event = storage.cache.get(message_id)
+    if event is None or event.guild_id != interaction.guild_id:
+        return member_choices(interaction.guild_id, current)
 
-@bot.tree.command(name="toppvp", description="Ver ranking privado de presença em ações PVP", guild=guild_obj)
+    prefix = current.strip().casefold()
+    roster = storage.cache.roster(event)
+    return [
+        app_commands.Choice(name=name, value=str(user_id))
+        for user_id, name in sorted(roster.items(), key=lambda item: item[1].casefold())
+        if name.casefold().startswith(prefix)
+    ][:25]
+
+@bot.tree.command(name="toppvp", description="Ver ranking privado de presença em ações PVP", guilds=guild_objs)
+@instrumented
 async def toppvp(interaction: discord.Interaction):
     if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
         await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
         return
 
-    rows = get_top_pvp(limit=10)
+    rows = await storage.get_top_pvp(interaction.guild_id, limit=10)
 
     if not rows:
         await interaction.response.send_message("📭 Ainda não há confirmações PVP nesta semana.", ephemeral=True)
@@ -517,9 +3961,9 @@ async def toppvp(interaction: discord.Interaction):
 
     medals = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
 
-    for i, (membro, total) in enumerate(rows):
+    for i, (user_id, membro, total) in enumerate(rows):
         embed.add_field(
-            name=f"{medals[i]} {membro}",
+            name=f"{medals[i]} {member_display_name(interaction.guild_id, user_id, membro)}",
             value=f"{int(total)} confirmações",
             inline=False
         )
@@ -527,7 +3971,227 @@ async def toppvp(interaction: discord.Interaction):
     embed.set_footer(text=f"Semana atual: {get_week_key()}")
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
-@bot.tree.command(name="tutorial", description="Aprender a usar o bot", guild=guild_obj)
+@bot.tree.command(name="historico", description="Ver ranking e evolução de farms e PVP em várias semanas", guilds=guild_objs)
+@app_commands.describe(
+    semanas="Quantidade de semanas do período (1 a 52)",
+    fim="Última semana do período, ex.: 2026-W40 (padrão: semana atual)",
+    membro="Ver a evolução semana a semana de um membro"
+)
+@instrumented
+async def historico(interaction: discord.Interaction, semanas: app_commands.Range[int, 1, 52] = 4, fim: str = None, membro: str = None):
+    if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
+        await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
+        return
+
+    last_week_key = get_week_key()
+    if fim is not None:
+        try:
+            last_week_key = parse_week_key(fim)
+        except ValueError:
+            await interaction.response.send_message("❌ Semana inválida. Use o formato `2026-W40`.", ephemeral=True)
+            return
+
+    week_keys = get_week_range(last_week_key, semanas)
+
+    if membro is not None:
+        membro_id = member_indexes[interaction.guild_id].resolve(membro)
+        if membro_id is None and membro.strip().isdigit():
+            membro_id = int(membro.strip())
+        if membro_id is None:
+            await interaction.response.send_message("❌ Membro não encontrado. Escolha um membro da lista de sugestões.", ephemeral=True)
+            return
+
+        rows = await storage.get_member_history(interaction.guild_id, membro_id, week_keys)
+        name = member_display_name(interaction.guild_id, membro_id, str(membro_id))
+        render = functools.partial(build_member_history_embed, name, rows)
+    else:
+        rows = await storage.get_farm_history(interaction.guild_id, week_keys)
+        if not rows:
+            await interaction.response.send_message("📭 Não há farms nem confirmações PVP nesse período.", ephemeral=True)
+            return
+
+        render = functools.partial(build_history_embed, interaction.guild_id, week_keys, rows)
+
+    view = HistoryView(count_pages(len(rows), HISTORY_PAGE_SIZE), render)
+    await interaction.response.send_message(embed=render(0), view=view, ephemeral=True)
+
+@historico.autocomplete("membro")
+@instrumented
+async def historico_membro_autocomplete(interaction: discord.Interaction, current: str):
+    return member_choices(interaction.guild_id, current)
+
+@bot.tree.command(name="ritmo", description="Ver o ritmo de farms por membro nas últimas horas ou dias", guilds=guild_objs)
+@app_commands.describe(
+    periodo="Quantidade de horas ou dias (1 a 72)",
+    unidade="Unidade do período"
+)
+@app_commands.choices(unidade=[
+    app_commands.Choice(name="Horas", value="horas"),
+    app_commands.Choice(name="Dias", value="dias"),
+])
+@instrumented
+async def ritmo(interaction: discord.Interaction, periodo: app_commands.Range[int, 1, 72] = 24, unidade: app_commands.Choice[str] = None):
+    if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
+        await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
+        return
+
+    unit = unidade.value if unidade is not None else "horas"
+    bucket_seconds = 3600 if unit == "horas" else 86400
+    suffix = "h" if unit == "horas" else "dia"
+    since = get_timestamp() - periodo * bucket_seconds
+    rows = await storage.get_farm_rate(interaction.guild_id, since, bucket_seconds, periodo)
+
+    if not rows:
+        await interaction.response.send_message(f"📭 Nenhum farm registrado nas últimas {periodo} {unit}.", ephemeral=True)
+        return
+
+    totals = [sum(values) for values in zip(*(buckets for _, _, buckets in rows))]
+    embed = discord.Embed(
+        title="⏱️ Ritmo de farms",
+        description=(
+            f"Últimas {periodo} {unit}, {len(rows)} membros.\n"
+            f"`{sparkline(totals)}`\n"
+            f"Total: {sum(totals):.0f} un | Média: {sum(totals) / periodo:.1f} un/{suffix}"
+        ),
+        color=0x3498DB
+    )
+
+    for i, (membro_id, membro, buckets) in enumerate(rows[:10], start=1):
+        total = sum(buckets)
+        embed.add_field(
+            name=f"{i}. {member_display_name(interaction.guild_id, membro_id, membro)}",
+            value=(
+                f"`{sparkline(buckets)}`\n"
+                f"Total: {total:.0f} un | Média: {total / periodo:.1f} un/{suffix} | Pico: {max(buckets):.0f} un/{suffix}"
+            ),
+            inline=False
+        )
+
+    embed.set_footer(text=f"Cada bloco do gráfico é 1 {'hora' if unit == 'horas' else 'dia'}, do mais antigo ao mais recente.")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="exportar", description="Exportar farms e presença PVP em CSV compactado", guilds=guild_objs)
+@app_commands.describe(
+    semanas="Quantidade de semanas do período (1 a 52)",
+    fim="Última semana do período, ex.: 2026-W40 (padrão: semana atual)"
+)
+@instrumented
+async def exportar(interaction: discord.Interaction, semanas: app_commands.Range[int, 1, 52] = 1, fim: str = None):
+    if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
+        await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
+        return
+
+    last_week_key = get_week_key()
+    if fim is not None:
+        try:
+            last_week_key = parse_week_key(fim)
+        except ValueError:
+            await interaction.response.send_message("❌ Semana inválida. Use o formato `2026-W40`.", ephemeral=True)
+            return
+
+    week_keys = get_week_range(last_week_key, semanas)
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    fd, path = tempfile.mkstemp(prefix="faction-export-", suffix=".zip")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        try:
+            counts = await storage.export_csv_zip(interaction.guild_id, week_keys, path)
+        except sqlite3.Error as e:
+            print(f"Erro ao exportar semanas {week_keys[0]} a {week_keys[-1]}: {e}")
+            await interaction.followup.send("❌ Não foi possível gerar a exportação. Tente novamente.", ephemeral=True)
+            return
+        metrics.observe("sql", "export_csv_zip", time.perf_counter() - start, sum(counts.values()))
+
+        size = os.path.getsize(path)
+        limit = interaction.guild.filesize_limit
+        if size > limit:
+            await interaction.followup.send(
+                f"❌ A exportação ficou com {size / 1024 / 1024:.1f} MB, acima do limite de "
+                f"{limit / 1024 / 1024:.0f} MB do servidor. Exporte menos semanas.",
+                ephemeral=True
+            )
+            return
+
+        summary = ", ".join(f"{table}: {count}" for table, count in counts.items())
+        await interaction.followup.send(
+            f"📦 Exportação das semanas `{week_keys[0]}` a `{week_keys[-1]}` ({summary}).",
+            file=discord.File(path, filename=f"faccao_{week_keys[0]}_{week_keys[-1]}.zip"),
+            ephemeral=True
+        )
+    finally:
+        os.remove(path)
+
+@bot.tree.command(name="recalcularranking", description="Recalcular os rankings a partir dos registros brutos", guilds=guild_objs)
+@instrumented
+async def recalcularranking(interaction: discord.Interaction):
+    if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
+        await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    farm_diffs, pvp_diffs = await storage.rebuild_rollups(interaction.guild_id)
+
+    embed = discord.Embed(
+        title="🔁 Rankings recalculados",
+        description="Os totais semanais foram reconstruídos a partir dos farms e confirmações registrados.",
+        color=0x2ECC71 if farm_diffs == 0 and pvp_diffs == 0 else 0xE67E22
+    )
+    embed.add_field(name="Divergências em farms", value=str(farm_diffs), inline=True)
+    embed.add_field(name="Divergências em PVP", value=str(pvp_diffs), inline=True)
+
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+def format_histograms(histograms: dict, limit: int, prefix: str = ""):
+    ranked = sorted(histograms.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+    lines = [
+        f"`{prefix}{name}` n={histogram.count} p50={histogram.quantile(0.5) * 1000:.0f}ms p99={histogram.quantile(0.99) * 1000:.0f}ms"
+        for name, histogram in ranked
+    ]
+    value = "\n".join(lines) or "Sem dados ainda."
+    return value[:1024]
+
+@bot.tree.command(name="stats", description="Ver métricas de desempenho do bot", guilds=guild_objs)
+@instrumented
+async def stats(interaction: discord.Interaction):
+    if not isinstance(interaction.user, discord.Member) or not is_admin(interaction.user):
+        await interaction.response.send_message("❌ Apenas admins podem usar esse comando.", ephemeral=True)
+        return
+
+    if not metrics.enabled:
+        await interaction.response.send_message("📭 As métricas estão desativadas (`FACTION_METRICS=0`).", ephemeral=True)
+        return
+
+    embed = discord.Embed(title="📊 Métricas do bot", color=0x3498DB)
+    embed.add_field(name="Comandos e botões", value=format_histograms(metrics.by_kind("interaction"), 10), inline=False)
+    embed.add_field(name="Consultas SQL", value=format_histograms(metrics.by_kind("sql"), 10), inline=False)
+    embed.add_field(name="API do Discord", value=format_histograms(metrics.by_kind("discord_api"), 5), inline=False)
+
+    lag = metrics.by_kind("event_loop").get("lag")
+    embed.add_field(
+        name="Event loop",
+        value=(
+            f"Atraso atual: {metrics.loop_lag * 1000:.1f}ms\n"
+            f"Atraso máximo: {(lag.max if lag else 0) * 1000:.1f}ms\n"
+            f"Rate limits: {metrics.counters.get('discord_rate_limits', 0)}"
+        ),
+        inline=True
+    )
+    embed.add_field(
+        name="Eventos PVP",
+        value=(
+            f"Edições: {pvp_renderer.edits} ({pvp_renderer.saved} economizadas)\n"
+            f"Cache: {storage.cache.hits} acertos, {storage.cache.misses} faltas"
+        ),
+        inline=True
+    )
+    embed.set_footer(text=f"Também gravado em {METRICS_FILE} a cada {METRICS_WRITE_INTERVAL}s")
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="tutorial", description="Aprender a usar o bot", guilds=guild_objs)
+@instrumented
 async def tutorial(interaction: discord.Interaction):
     embed = discord.Embed(
         title="📘 Tutorial do Bot da Facção",
@@ -537,7 +4201,12 @@ async def tutorial(interaction: discord.Interaction):
 
     embed.add_field(
         name="/farm",
-        value="Registra farm de Pedra ou Semente para um membro.",
+        value="Registra farm de Pedra ou Semente para um membro escolhido na lista de sugestões.",
+        inline=False
+    )
+    embed.add_field(
+        name="/farmlote",
+        value="Registra vários farms de uma vez (texto ou CSV com linhas `membro;tipo;qtd`, onde membro é o nome exibido, o ID ou a menção).",
         inline=False
     )
     embed.add_field(
@@ -547,12 +4216,17 @@ async def tutorial(interaction: discord.Interaction):
     )
     embed.add_field(
         name="/fechamento",
-        value="Publica o ranking oficial de farms no canal configurado.",
+        value="Publica a parcial do ranking de farms da semana atual no canal configurado. O fechamento oficial de cada semana é publicado sozinho após a virada.",
         inline=False
     )
     embed.add_field(
         name="/pvpevent",
-        value="Cria um embed com botões para membros confirmarem ou recusarem presença.",
+        value="Cria um embed com botões para membros confirmarem ou recusarem presença. Use `inicio` para informar o horário do evento. O botão 📋 Ver lista mostra todos os nomes em páginas.",
+        inline=False
+    )
+    embed.add_field(
+        name="/encerrarpvp",
+        value="Encerra um evento PVP, desativa os botões e congela a lista final. Eventos passados são encerrados sozinhos.",
         inline=False
     )
     embed.add_field(
@@ -565,7 +4239,40 @@ async def tutorial(interaction: discord.Interaction):
         value="Mostra ranking privado de confirmações PVP da semana.",
         inline=False
     )
+    embed.add_field(
+        name="/historico",
+        value="Mostra o ranking de farms e PVP de várias semanas ou a evolução de um membro.",
+        inline=False
+    )
+    embed.add_field(
+        name="/ritmo",
+        value="Mostra o ritmo de farms por membro nas últimas horas ou dias, com um mini gráfico.",
+        inline=False
+    )
+    embed.add_field(
+        name="/exportar",
+        value="Gera um arquivo compactado com os CSVs de farms, eventos e confirmações PVP do período.",
+        inline=False
+    )
+    embed.add_field(
+        name="/stats",
+        value="Mostra métricas de desempenho de comandos, consultas e API para admins.",
+        inline=False
+    )
+    embed.add_field(
+        name="/recalcularranking",
+        value="Reconstrói os rankings a partir dos registros e mostra se havia divergências.",
+        inline=False
+    )
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
-bot.run(TOKEN)
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        # python main.py rebuild [saida.db]: snapshot + diário -> banco novo
+        rebuild_from_journal(JOURNAL_SNAPSHOT_FILE, JOURNAL_FILE, sys.argv[2] if len(sys.argv) > 2 else "faction.rebuilt.db")
+    else:
+        try:
+            bot.run(TOKEN)
+        finally:
+            db.close()